@@ -0,0 +1,253 @@
+from functools import partial
+from itertools import cycle
+import argparse
+import json
+import random
+import statistics
+import sys
+import time
+
+from model import self_play
+from model.color import Color
+from model.direction import Direction
+from model.falling_figure import FallingFigure
+from model.figure import Figure
+from model.figure_generator import FigureGenerator
+from model.logic_model import LogicModel
+
+SIZES = [(10, 20), (20, 40), (40, 100), (100, 500), (200, 1000)]
+BASELINE_FILE = 'benchmarks.json'
+MIN_ROUND_TIME = 0.05
+COLORS = list(Color)
+
+
+def fill_sparse(matrix, rows, min_rectangle_area):
+    generator = random.Random(len(matrix) * len(matrix[0]))
+    for row in rows:
+        for column, item in enumerate(matrix[row]):
+            if item is None and generator.random() < 0.1:
+                matrix[row][column] = generator.choice(COLORS)
+
+
+def fill_dense(matrix, rows, min_rectangle_area):
+    generator = random.Random(len(matrix) * len(matrix[0]))
+    for row in rows:
+        for column, item in enumerate(matrix[row]):
+            if item is None and generator.random() >= 0.1:
+                matrix[row][column] = generator.choice(COLORS)
+
+
+def fill_adversarial(matrix, rows, min_rectangle_area):
+    block_height = 2
+    block_width = max(1, (min_rectangle_area - 1) // block_height)
+    for row in rows:
+        for column, item in enumerate(matrix[row]):
+            if item is None:
+                color_index = (row // block_height * 2 +
+                               column // block_width)
+                matrix[row][column] = COLORS[color_index % len(COLORS)]
+
+
+BOARDS = {
+    'sparse': fill_sparse,
+    'dense': fill_dense,
+    'adversarial': fill_adversarial
+}
+
+
+def create_model(board, width, height):
+    model = LogicModel(width, height, generator=FigureGenerator(0))
+    field = model.field
+    matrix = [list(items) for items in field.matrix]
+    BOARDS[board](matrix, range(height // 4, height - 3),
+                  field.min_rectangle_area)
+
+    well_column = width // 2 - 1
+    for row in range(height):
+        for column in range(1, width - 1):
+            if row >= height - 2:
+                matrix[row][column] = Color.RED
+            if well_column <= column <= well_column + 1:
+                matrix[row][column] = None
+
+    field.matrix = matrix
+    field.remove_completed_rectangle()
+    return model
+
+
+def place_figure(model, figure, row=None):
+    model.falling_figure.remove_figure_from_field()
+    model.current_figure, model.current_color = figure, Color.RED
+    falling = model.falling_figure = FallingFigure(model.field, figure,
+                                                   Color.RED)
+    if row is not None:
+        falling.remove_figure_from_field()
+        falling.row = row
+        falling.display_figure_on_field()
+    return falling
+
+
+def bench_spawn(model):
+    return model._spawn_figure
+
+
+def bench_move(model):
+    falling = place_figure(model, Figure.T_FIGURE, 1)
+    directions = cycle([Direction.LEFT, Direction.RIGHT])
+    return lambda: falling.try_move(next(directions))
+
+
+def bench_rotate(model):
+    return place_figure(model, Figure.T_FIGURE, 1).try_rotate_left
+
+
+def bench_hard_drop(model):
+    falling = place_figure(model, Figure.O_FIGURE)
+    row = falling.row
+
+    def hard_drop():
+        falling.drop_figure()
+        falling.remove_figure_from_field()
+        falling.row = row
+
+    return hard_drop
+
+
+def bench_lock_and_clear(model):
+    place_figure(model, Figure.O_FIGURE)
+    return model.drop
+
+
+OPERATIONS = {
+    'spawn': bench_spawn,
+    'move': bench_move,
+    'rotate': bench_rotate,
+    'hard_drop': bench_hard_drop,
+    'lock_and_clear': bench_lock_and_clear
+}
+ONE_SHOT_OPERATIONS = {'lock_and_clear'}
+
+
+class Benchmark:
+    def __init__(self, name, prepare, one_shot=False):
+        self.name = name
+        self.prepare = prepare
+        self.one_shot = one_shot
+
+
+def prepare_operation(bench, board, width, height):
+    return bench(create_model(board, width, height))
+
+
+def prepare_game(width, height):
+    return partial(self_play.play_game, 0, 'random', width, height)
+
+
+def create_benchmarks(sizes):
+    benchmarks = []
+    for width, height in sizes:
+        size = '{}x{}'.format(width, height)
+        for operation, bench in OPERATIONS.items():
+            for board in BOARDS:
+                benchmarks.append(Benchmark(
+                    '/'.join((operation, board, size)),
+                    partial(prepare_operation, bench, board, width, height),
+                    operation in ONE_SHOT_OPERATIONS))
+        benchmarks.append(Benchmark('game/random/' + size,
+                                    partial(prepare_game, width, height)))
+    return benchmarks
+
+
+def time_steps(step, number):
+    start_time = time.perf_counter()
+    for _ in range(number):
+        step()
+    return (time.perf_counter() - start_time) / number
+
+
+def measure(benchmark, rounds):
+    if benchmark.one_shot:
+        return [time_steps(benchmark.prepare(), 1) for _ in range(rounds)]
+
+    step = benchmark.prepare()
+    number = 1
+    while time_steps(step, number) * number < MIN_ROUND_TIME:
+        number *= 2
+    return [time_steps(step, number) for _ in range(rounds)]
+
+
+def parse_size(text):
+    width, height = text.lower().split('x')
+    return int(width), int(height)
+
+
+def parse_arguments():
+    parser = argparse.ArgumentParser(
+        description='Time the hot paths of Field and FallingFigure on '
+                    'sparse, dense and adversarial boards of several sizes '
+                    'and compare them with the saved baseline.')
+    parser.add_argument('-k', '--filter', default='',
+                        help='run only benchmarks whose name contains '
+                             'this string')
+    parser.add_argument('--sizes', nargs='+', type=parse_size,
+                        default=SIZES, metavar='WIDTHxHEIGHT')
+    parser.add_argument('-r', '--rounds', type=int, default=5)
+    parser.add_argument('--baseline', default=BASELINE_FILE)
+    parser.add_argument('--save', action='store_true',
+                        help='store the results as the new baseline')
+    parser.add_argument('-t', '--threshold', type=float, default=0.25,
+                        help='allowed slowdown of the best round relative '
+                             'to the baseline (default: 0.25)')
+    return parser.parse_args()
+
+
+def load_baseline(path):
+    try:
+        with open(path) as file:
+            return json.load(file)
+    except (OSError, ValueError):
+        return {}
+
+
+def main():
+    arguments = parse_arguments()
+    baseline = load_baseline(arguments.baseline)
+    results = {}
+    regressions = []
+
+    print('{:<34} {:>12} {:>12} {:>12}'.format('benchmark', 'min, us',
+                                               'mean, us', 'baseline'))
+    for benchmark in create_benchmarks(arguments.sizes):
+        if arguments.filter not in benchmark.name:
+            continue
+        timings = measure(benchmark, arguments.rounds)
+        result = results[benchmark.name] = {
+            'min': min(timings),
+            'mean': statistics.mean(timings),
+            'rounds': len(timings)
+        }
+
+        change = ''
+        if benchmark.name in baseline:
+            ratio = result['min'] / baseline[benchmark.name]['min']
+            change = '{:+.0%}'.format(ratio - 1)
+            if ratio > 1 + arguments.threshold:
+                regressions.append(benchmark.name)
+                change += ' !'
+        print('{:<34} {:>12.2f} {:>12.2f} {:>12}'.format(
+            benchmark.name, 1e6 * result['min'], 1e6 * result['mean'],
+            change))
+
+    if arguments.save:
+        baseline.update(results)
+        with open(arguments.baseline, 'w') as file:
+            json.dump(baseline, file, indent=2, sort_keys=True)
+
+    if regressions:
+        print('regressions: {}'.format(', '.join(regressions)))
+        return 1
+    return 0
+
+
+if __name__ == '__main__':
+    sys.exit(main())
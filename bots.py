@@ -0,0 +1,66 @@
+import argparse
+import asyncio
+import time
+
+from network import client
+from network.server import GameServer
+
+
+def parse_arguments():
+    parser = argparse.ArgumentParser(
+        description='Connect many headless bots to a Tetris server and '
+                    'report the load it sustains.')
+    parser.add_argument('-n', '--bots', type=int, default=100)
+    parser.add_argument('-g', '--games', type=int, default=1,
+                        help='games played by every bot')
+    parser.add_argument('-p', '--policy', default='random',
+                        choices=sorted(client.BOT_POLICIES))
+    parser.add_argument('-s', '--seed', type=int, default=0,
+                        help='seed of the first bot, bot i uses seed + i')
+    parser.add_argument('--host', default='127.0.0.1')
+    parser.add_argument('--port', type=int, default=7777)
+    parser.add_argument('--local', action='store_true',
+                        help='start a server in this process instead of '
+                             'connecting to --host and --port')
+    parser.add_argument('--speed', type=float, default=10.0,
+                        help='tick rate multiplier of the local server')
+    return parser.parse_args()
+
+
+async def run_bots(arguments):
+    server = None
+    port = arguments.port
+    if arguments.local:
+        server = GameServer(speed=arguments.speed)
+        port = await server.start(arguments.host, 0)
+
+    start_time = time.perf_counter()
+    try:
+        results = await asyncio.gather(*[
+            client.run_bot(arguments.host, port, arguments.policy,
+                           arguments.seed + index, arguments.games)
+            for index in range(arguments.bots)])
+    finally:
+        if server is not None:
+            await server.close()
+    elapsed_time = time.perf_counter() - start_time
+
+    games = sum(len(result.scores) for result in results)
+    figures_count = sum(result.figures_count for result in results)
+    messages_count = sum(result.messages_count for result in results)
+    print('bots: {}, games: {}, {:.2f} s, {:.0f} pieces/s, '
+          '{:.0f} messages/s'.format(len(results), games, elapsed_time,
+                                     figures_count / elapsed_time,
+                                     messages_count / elapsed_time))
+    if server is not None:
+        print('server: {:.0f} ticks/s, {:.1f} KB/s'.format(
+            server.ticks / elapsed_time,
+            server.bytes_sent / 1024 / elapsed_time))
+
+
+def main():
+    asyncio.run(run_bots(parse_arguments()))
+
+
+if __name__ == '__main__':
+    main()
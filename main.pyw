@@ -1,10 +1,44 @@
 from PyQt5.QtWidgets import QApplication
+import argparse
 import sys
 from view.game_window import GameWindow
-from model import logic_model
+from model import field, logic_model, replay
+
+
+def parse_arguments():
+    parser = argparse.ArgumentParser(description='Play Tetris.')
+    parser.add_argument('replay', nargs='?',
+                        help='watch this replay instead of playing')
+    parser.add_argument('--width', type=int, default=10)
+    parser.add_argument('--height', type=int, default=20)
+    parser.add_argument('--walls', default='alternating',
+                        choices=sorted(field.WALL_PATTERNS),
+                        help='wall layout of the field')
+    parser.add_argument('--walls-seed', type=int, default=0,
+                        help='seed of the random wall layout')
+    parser.add_argument('--min-area', type=int, default=None,
+                        help='minimum area of a removed rectangle '
+                             '(default: field width - 1)')
+    parser.add_argument('--preview', type=int, default=1,
+                        help='number of next figures shown')
+    arguments = parser.parse_args()
+    if arguments.min_area is not None and arguments.min_area < 1:
+        parser.error('--min-area must be a positive number')
+    return arguments
 
 
 if __name__ == '__main__':
-    app = QApplication(sys.argv)
-    _ = GameWindow(logic_model.LogicModel())
-    sys.exit(app.exec())
+    arguments = parse_arguments()
+    app = QApplication(sys.argv[:1])
+    if arguments.replay is not None:
+        with open(arguments.replay, 'rb') as replay_file:
+            player = replay.ReplayPlayer(replay.ReplayReader(replay_file))
+            _ = GameWindow(player.logic_model, player, arguments.preview)
+            exit_code = app.exec()
+    else:
+        _ = GameWindow(logic_model.LogicModel(
+            arguments.width, arguments.height,
+            min_rectangle_area=arguments.min_area, walls=arguments.walls,
+            walls_seed=arguments.walls_seed), preview_count=arguments.preview)
+        exit_code = app.exec()
+    sys.exit(exit_code)
@@ -1,2 +1,4 @@
-__all__ = ['color', 'direction', 'falling_figure', 'field', 'figure',
-           'logic_model', 'position']
+__all__ = ['action', 'ai', 'array_field', 'color', 'colors_modes', 'direction',
+           'events', 'falling_figure', 'field', 'figure', 'figure_generator',
+           'game_engine', 'game_loop', 'logic_model', 'position', 'profiler',
+           'replay', 'self_play']
@@ -0,0 +1,9 @@
+from enum import Enum
+
+
+class Action(Enum):
+    LEFT = 1
+    RIGHT = 2
+    DOWN = 3
+    ROTATE = 4
+    DROP = 5
@@ -0,0 +1,405 @@
+from model.action import Action
+from model.falling_figure import FIGURES_ROTATIONS, SPAWN_OFFSETS
+from model.wall import Wall
+from collections import OrderedDict, deque
+
+DEFAULT_WEIGHTS = {
+    'scores': 4.0,
+    'aggregate_height': -0.5,
+    'max_height': -0.3,
+    'holes': -3.5,
+    'bumpiness': -0.2,
+    'adjacency': 0.6,
+    'top_out': -1000000.0
+}
+
+
+def _bits(mask):
+    while mask:
+        low_bit = mask & -mask
+        yield low_bit.bit_length() - 1
+        mask ^= low_bit
+
+
+def _flood_down(valid, seeds):
+    return (((valid + seeds) ^ valid) & valid) | seeds
+
+
+class TranspositionTable:
+    def __init__(self, capacity=65536):
+        self.capacity = capacity
+        self.hits = 0
+        self.misses = 0
+        self._entries = OrderedDict()
+
+    def __len__(self):
+        return len(self._entries)
+
+    def get(self, key):
+        value = self._entries.get(key)
+        if value is None:
+            self.misses += 1
+        else:
+            self.hits += 1
+            self._entries.move_to_end(key)
+        return value
+
+    def put(self, key, value):
+        self._entries[key] = value
+        self._entries.move_to_end(key)
+        if len(self._entries) > self.capacity:
+            self._entries.popitem(last=False)
+
+
+class Placement:
+    def __init__(self, rotation, row, column, value):
+        self.rotation = rotation
+        self.row = row
+        self.column = column
+        self.value = value
+
+
+class _Reachability:
+    def __init__(self, field, rotations, rotation, row, column):
+        self.field = field
+        self.rotations = rotations
+        self.offset = max(0, -row)
+        self.all_rows = (1 << (field.height + self.offset)) - 1
+        self._valid = {}
+
+        bottom = max(cell_row for shape in rotations
+                     for cell_row, _ in shape) + 1
+        self._masks = []
+        for _column in range(field.width):
+            mask = (field._column_masks[_column] << self.offset |
+                    ((1 << bottom) - 1) << (field.height + self.offset))
+            for _row in range(-self.offset, 0):
+                if (field.height + _row >= 0 and
+                        field.is_wall(_row, _column)):
+                    mask |= 1 << (_row + self.offset)
+            self._masks.append(mask)
+
+        self.reachable = {}
+        start = 1 << (row + self.offset)
+        if start & self.valid(rotation, column):
+            self._explore(rotation, column, start)
+
+    def valid(self, rotation, column):
+        key = rotation, column
+        if key not in self._valid:
+            invalid = 0
+            for row, shape_column in self.rotations[rotation]:
+                if not 0 <= column + shape_column < self.field.width:
+                    invalid = self.all_rows
+                    break
+                invalid |= self._masks[column + shape_column] >> row
+            self._valid[key] = ~invalid & self.all_rows
+        return self._valid[key]
+
+    def _neighbours(self, rotation, column):
+        return ((rotation, column - 1), (rotation, column + 1),
+                ((rotation + 1) % len(self.rotations), column))
+
+    def _explore(self, rotation, column, seeds):
+        self.reachable[rotation, column] = _flood_down(
+            self.valid(rotation, column), seeds)
+        stack = [(rotation, column)]
+        while stack:
+            rotation, column = stack.pop()
+            rows = self.reachable[rotation, column]
+            for neighbour in self._neighbours(rotation, column):
+                valid = self.valid(*neighbour)
+                known = self.reachable.get(neighbour, 0)
+                if rows & valid & ~known:
+                    self.reachable[neighbour] = _flood_down(
+                        valid, (rows & valid) | known)
+                    stack.append(neighbour)
+
+    def placements(self):
+        for (rotation, column), rows in self.reachable.items():
+            landed = rows & ~(self.valid(rotation, column) >> 1)
+            for bit in _bits(landed):
+                yield rotation, bit - self.offset, column
+
+    def path(self, rotation, row, column, target):
+        start = (rotation, row + self.offset, column)
+        target = (target[0], target[1] + self.offset, target[2])
+
+        descent = []
+        rotation, row, column = start
+        while row <= target[1] and self.valid(rotation, column) >> row & 1:
+            simple_path = self._simple_path((rotation, row, column), target)
+            if simple_path is not None:
+                return descent + simple_path
+            descent.append(Action.DOWN)
+            row += 1
+
+        parents = {start: None}
+        queue = deque([start])
+        while queue:
+            state = queue.popleft()
+            if state == target:
+                break
+            rotation, row, column = state
+            moves = ((Action.LEFT, (rotation, row, column - 1)),
+                     (Action.RIGHT, (rotation, row, column + 1)),
+                     (Action.DOWN, (rotation, row + 1, column)),
+                     (Action.ROTATE, ((rotation + 1) % len(self.rotations),
+                                      row, column)))
+            for action, next_state in moves:
+                if (next_state not in parents and
+                        self.valid(next_state[0], next_state[2]) >>
+                        next_state[1] & 1):
+                    parents[next_state] = (state, action)
+                    queue.append(next_state)
+
+        actions = [Action.DROP]
+        state = target
+        while parents.get(state) is not None:
+            state, action = parents[state]
+            actions.append(action)
+        actions.reverse()
+        return actions
+
+    def _simple_path(self, start, target):
+        rotation, row, column = start
+        actions = []
+        while rotation != target[0]:
+            rotation = (rotation + 1) % len(self.rotations)
+            if not self.valid(rotation, column) >> row & 1:
+                return None
+            actions.append(Action.ROTATE)
+
+        step = 1 if target[2] > column else -1
+        while column != target[2]:
+            column += step
+            if not self.valid(rotation, column) >> row & 1:
+                return None
+            actions.append(Action.RIGHT if step > 0 else Action.LEFT)
+
+        valid = self.valid(rotation, column)
+        landed = _flood_down(valid, 1 << row) & ~(valid >> 1)
+        if landed != 1 << target[1]:
+            return None
+        actions.append(Action.DROP)
+        return actions
+
+
+class PlacementAI:
+    def __init__(self, weights=None, lookahead=False, table_size=65536):
+        self.weights = dict(DEFAULT_WEIGHTS)
+        if weights is not None:
+            self.weights.update(weights)
+        self.lookahead = lookahead
+        self.table = TranspositionTable(table_size)
+        self._base = None
+
+    def decide(self, logic_model):
+        falling_figure = logic_model.falling_figure
+        placement, reachability = self._search(logic_model)
+        if placement is None:
+            return [Action.DROP]
+        return reachability.path(
+            falling_figure.rotation, falling_figure.row,
+            falling_figure.column,
+            (placement.rotation, placement.row, placement.column))
+
+    def best_placement(self, logic_model):
+        return self._search(logic_model)[0]
+
+    def _search(self, logic_model):
+        falling_figure = logic_model.falling_figure
+        field = logic_model.field
+        next_figure = logic_model.next_figure if self.lookahead else None
+
+        falling_figure.remove_figure_from_field()
+        dirty_region = field._dirty_region
+        events, field.events = field.events, None
+        try:
+            reachability = _Reachability(
+                field, falling_figure.rotations, falling_figure.rotation,
+                falling_figure.row, falling_figure.column)
+            best = None
+            for rotation, row, column in reachability.placements():
+                value = self._placement_value(
+                    field, falling_figure.rotations[rotation], row, column,
+                    falling_figure.color, next_figure,
+                    logic_model.next_color)
+                if best is None or value > best.value:
+                    best = Placement(rotation, row, column, value)
+            return best, reachability
+        finally:
+            field.events = events
+            field._dirty_region = dirty_region
+            falling_figure.display_figure_on_field()
+
+    @staticmethod
+    def placements(field, rotations, rotation, row, column):
+        reachability = _Reachability(field, rotations, rotation, row, column)
+        return [Placement(rotation, row, column, None)
+                for rotation, row, column in reachability.placements()]
+
+    def _placement_value(self, field, shape, row, column, color,
+                         next_figure=None, next_color=None):
+        if row < 0:
+            return self.weights['top_out']
+
+        cells = [(row + cell_row, column + cell_column)
+                 for cell_row, cell_column in shape]
+        base = self._base_features(field) if next_figure is None else None
+        for cell_row, cell_column in cells:
+            field.set_cell(cell_row, cell_column, color)
+
+        try:
+            key = (field.hash, field.current_level,
+                   field.destroyed_rectangles_count, next_figure, next_color)
+            value = self.table.get(key)
+            if value is not None:
+                return value
+
+            snapshot = None
+            scores = 0
+            if self._may_complete_rectangle(field, cells, color):
+                field._dirty_region = None
+                for cell_row, cell_column in cells:
+                    field.mark_dirty(cell_row, cell_column, cell_row,
+                                     cell_column)
+                if field._search_max_area_rectangle() is not None:
+                    snapshot = field.snapshot()
+                    field.remove_completed_rectangle()
+                    scores = field.scores - snapshot.scores
+
+            try:
+                value = self.weights['scores'] * scores
+                if next_figure is not None:
+                    value += self._next_figure_value(field, next_figure,
+                                                     next_color)
+                elif snapshot is None:
+                    value += self._value(*self._placement_features(
+                        field, base, cells, color))
+                else:
+                    value += self.evaluate(field)
+            finally:
+                if snapshot is not None:
+                    field.restore(snapshot)
+                    field.release(snapshot)
+            self.table.put(key, value)
+            return value
+        finally:
+            for cell_row, cell_column in cells:
+                field.set_cell(cell_row, cell_column, None)
+
+    @staticmethod
+    def _may_complete_rectangle(field, cells, color):
+        get_cell = field.get_cell
+        for row, column in cells:
+            left = column
+            while left > 0 and get_cell(row, left - 1) is color:
+                left -= 1
+            right = column
+            while right < field.width - 1 and \
+                    get_cell(row, right + 1) is color:
+                right += 1
+            top = row
+            while top > 0 and get_cell(top - 1, column) is color:
+                top -= 1
+            bottom = row
+            while bottom < field.height - 1 and \
+                    get_cell(bottom + 1, column) is color:
+                bottom += 1
+            if ((right - left + 1) * (bottom - top + 1) >=
+                    field.min_rectangle_area):
+                return True
+        return False
+
+    def _next_figure_value(self, field, next_figure, next_color):
+        rotations = FIGURES_ROTATIONS[next_figure][0]
+        row, column = SPAWN_OFFSETS[next_figure]
+        column += field.width // 2 - 1
+
+        dirty_region = field._dirty_region
+        best = self.weights['top_out']
+        reachability = _Reachability(field, rotations, 0, row, column)
+        for rotation, row, column in reachability.placements():
+            best = max(best, self._placement_value(
+                field, rotations[rotation], row, column, next_color))
+        field._dirty_region = dirty_region
+        return best
+
+    def evaluate(self, field):
+        return self._value(*self._features(field))
+
+    @staticmethod
+    def _column_features(field, column):
+        blocks = field._column_masks[column] & ~field._wall_masks[column]
+        if not blocks:
+            return 0, 0
+        top = (blocks & -blocks).bit_length() - 1
+        filled = bin(field._column_masks[column] >> top).count('1')
+        return field.height - top, field.height - top - filled
+
+    def _features(self, field):
+        heights = []
+        holes = []
+        for column in range(field.width):
+            height, column_holes = self._column_features(field, column)
+            heights.append(height)
+            holes.append(column_holes)
+
+        adjacency = 0
+        previous_items = None
+        for row in range(field.height - max(heights), field.height):
+            if not field._row_counts[row]:
+                previous_items = None
+                continue
+            items = field._row(row)
+            for column in range(field.width):
+                item = items[column]
+                if item is None or item is Wall.WALL:
+                    continue
+                if column and items[column - 1] is item:
+                    adjacency += 1
+                if previous_items is not None and \
+                        previous_items[column] is item:
+                    adjacency += 1
+            previous_items = items
+        return heights, holes, adjacency
+
+    def _base_features(self, field):
+        if (self._base is None or self._base[0] is not field or
+                self._base[1] != field.hash):
+            self._base = (field, field.hash, self._features(field))
+        return self._base[2]
+
+    def _placement_features(self, field, base, cells, color):
+        heights, holes, adjacency = base
+        heights = list(heights)
+        holes = list(holes)
+        for column in {cell_column for _, cell_column in cells}:
+            heights[column], holes[column] = \
+                self._column_features(field, column)
+
+        placed = set(cells)
+        for row, column in cells:
+            for neighbour in ((row, column - 1), (row - 1, column)):
+                if neighbour in placed:
+                    adjacency += 1
+            for neighbour_row, neighbour_column in (
+                    (row, column - 1), (row, column + 1),
+                    (row - 1, column), (row + 1, column)):
+                if ((neighbour_row, neighbour_column) not in placed and
+                        0 <= neighbour_row < field.height and
+                        0 <= neighbour_column < field.width and
+                        field.get_cell(neighbour_row,
+                                       neighbour_column) is color):
+                    adjacency += 1
+        return heights, holes, adjacency
+
+    def _value(self, heights, holes, adjacency):
+        bumpiness = sum(abs(left - right)
+                        for left, right in zip(heights, heights[1:]))
+        return (self.weights['aggregate_height'] * sum(heights) +
+                self.weights['max_height'] * max(heights) +
+                self.weights['holes'] * sum(holes) +
+                self.weights['bumpiness'] * bumpiness +
+                self.weights['adjacency'] * adjacency)
@@ -0,0 +1,116 @@
+from collections.abc import Sequence
+
+from model.field import Field
+from model.wall import Wall
+from model.color import Color
+
+ITEMS = [None for _ in range(len(Color) + 2)]
+for _color in Color:
+    ITEMS[_color.value] = _color
+WALL_CODE = len(ITEMS) - 1
+ITEMS[WALL_CODE] = Wall.WALL
+ITEMS = tuple(ITEMS)
+CODES = {item: code for code, item in enumerate(ITEMS)}
+
+_CLEAR_TABLE = bytes(WALL_CODE if code == WALL_CODE else 0
+                     for code in range(256))
+
+
+class _ReadOnlyView(Sequence):
+    def __setitem__(self, index, value):
+        raise TypeError('ArrayField.matrix is read-only, use set_cell')
+
+    def __eq__(self, other):
+        if not isinstance(other, (list, _ReadOnlyView)):
+            return NotImplemented
+        return list(self) == list(other)
+
+    __hash__ = None
+
+    def __repr__(self):
+        return repr(list(self))
+
+    def __reduce__(self):
+        return list, (list(self),)
+
+
+class _RowView(_ReadOnlyView):
+    def __init__(self, field, row):
+        self._field = field
+        self._row = row
+
+    def __len__(self):
+        return self._field.width
+
+    def __getitem__(self, column):
+        if isinstance(column, slice):
+            return list(self)[column]
+        if column < 0:
+            column += self._field.width
+        if not 0 <= column < self._field.width:
+            raise IndexError('column index out of range')
+        return self._field.get_cell(self._row, column)
+
+    def __iter__(self):
+        return iter(self._field._row(self._row))
+
+
+class _MatrixView(_ReadOnlyView):
+    def __init__(self, field):
+        self._field = field
+
+    def __len__(self):
+        return self._field.height
+
+    def __getitem__(self, row):
+        if isinstance(row, slice):
+            return list(self)[row]
+        if row < 0:
+            row += self._field.height
+        if not 0 <= row < self._field.height:
+            raise IndexError('row index out of range')
+        return _RowView(self._field, row)
+
+    def __iter__(self):
+        return (_RowView(self._field, row)
+                for row in range(self._field.height))
+
+
+class ArrayField(Field):
+    def _load_matrix(self, matrix):
+        self._codes = bytearray(CODES[item] for row in matrix
+                                for item in row)
+
+    @property
+    def matrix(self):
+        return _MatrixView(self)
+
+    @matrix.setter
+    def matrix(self, matrix):
+        Field.matrix.fset(self, matrix)
+
+    def get_cell(self, row, column):
+        return ITEMS[self._codes[row * self.width + column]]
+
+    def _store(self, row, column, item):
+        self._codes[row * self.width + column] = CODES[item]
+
+    def is_free(self, row, column):
+        return not self._codes[row * self.width + column]
+
+    def is_wall(self, row, column):
+        return self._codes[row * self.width + column] == WALL_CODE
+
+    def _row(self, row):
+        start = row * self.width
+        return [ITEMS[code] for code in self._codes[start:start + self.width]]
+
+    def clear_field(self):
+        if self._journal is not None:
+            Field.clear_field(self)
+            return
+
+        self._codes = self._codes.translate(_CLEAR_TABLE)
+        self._rebuild_indexes()
+        self.scores = 0
+        self._dirty_region = None
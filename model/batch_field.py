@@ -0,0 +1,166 @@
+from model.array_field import ArrayField, CODES, ITEMS, WALL_CODE
+from model.color import Color
+from model.position import Position
+import numpy
+
+
+class BatchField:
+    def __init__(self, codes, min_rectangle_area=None):
+        self.codes = numpy.ascontiguousarray(codes, dtype=numpy.uint8)
+        self.count, self.height, self.width = self.codes.shape
+        if min_rectangle_area is None:
+            min_rectangle_area = max(1, self.width - 1)
+        if min_rectangle_area < 1:
+            raise ValueError('Minimum rectangle area must be positive')
+        self.min_rectangle_area = min_rectangle_area
+
+    @classmethod
+    def from_fields(cls, fields):
+        fields = list(fields)
+        codes = numpy.array([[[CODES[item] for item in field._row(row)]
+                              for row in range(field.height)]
+                             for field in fields], dtype=numpy.uint8)
+        return cls(codes, fields[0].min_rectangle_area)
+
+    @classmethod
+    def repeat(cls, field, count):
+        batch = cls.from_fields([field])
+        return cls(numpy.repeat(batch.codes, count, axis=0),
+                   field.min_rectangle_area)
+
+    def __len__(self):
+        return self.count
+
+    def copy(self):
+        return BatchField(self.codes.copy(), self.min_rectangle_area)
+
+    def to_field(self, index, field_type=ArrayField):
+        field = field_type(self.width, self.height,
+                           min_rectangle_area=self.min_rectangle_area)
+        field.matrix = [[ITEMS[code] for code in row]
+                        for row in self.codes[index].tolist()]
+        return field
+
+    def _cells(self, shape, rows, columns):
+        rows = numpy.broadcast_to(rows, (self.count,))
+        columns = numpy.broadcast_to(columns, (self.count,))
+        for row, column in shape:
+            yield rows + row, columns + column
+
+    def collides(self, shape, rows, columns):
+        boards = numpy.arange(self.count)
+        collisions = numpy.zeros(self.count, dtype=bool)
+        for row, column in self._cells(shape, rows, columns):
+            outside = ((row >= self.height) | (row < -self.height) |
+                       (column < 0) | (column >= self.width))
+            items = self.codes[boards, row.clip(-self.height,
+                                                self.height - 1),
+                               column.clip(0, self.width - 1)]
+            collisions |= (outside | (items == WALL_CODE) |
+                           ((row >= 0) & (items != 0)))
+        return collisions
+
+    def drop_rows(self, shape, rows, columns):
+        rows = numpy.array(numpy.broadcast_to(rows, (self.count,)))
+        falling = ~self.collides(shape, rows, columns)
+        while falling.any():
+            falling &= ~self.collides(shape, rows + 1, columns)
+            rows += falling
+        return rows
+
+    def place(self, shape, rows, columns, color, mask=None):
+        boards = numpy.arange(self.count)
+        if mask is None:
+            mask = numpy.ones(self.count, dtype=bool)
+        for row, column in self._cells(shape, rows, columns):
+            visible = mask & (row >= 0)
+            self.codes[boards[visible], row[visible],
+                       column[visible]] = CODES[color]
+
+    def heights(self):
+        blocks = (self.codes != 0) & (self.codes != WALL_CODE)
+        filled = blocks.any(axis=1)
+        tops = blocks.argmax(axis=1)
+        return numpy.where(filled, self.height - tops, 0)
+
+    def holes(self):
+        tops = self.height - self.heights()
+        rows = numpy.arange(self.height).reshape(1, -1, 1)
+        empty = (self.codes == 0) & (rows >= tops[:, numpy.newaxis, :])
+        return empty.sum(axis=(1, 2))
+
+    def bumpiness(self):
+        return numpy.abs(numpy.diff(self.heights(), axis=1)).sum(axis=1)
+
+    def _runs(self):
+        codes = numpy.where(self.codes == WALL_CODE, 0,
+                            self.codes).transpose(1, 2, 0).copy()
+        filled = codes != 0
+        same_above = codes[1:] == codes[:-1]
+        same_left = codes[:, 1:] == codes[:, :-1]
+
+        heights = filled.astype(numpy.int32)
+        for row in range(1, self.height):
+            heights[row] += heights[row - 1] * same_above[row - 1]
+            heights[row] *= filled[row]
+
+        lefts = numpy.empty(codes.shape, dtype=numpy.int32)
+        lefts[...] = numpy.arange(self.width).reshape(1, -1, 1)
+        right_gaps = lefts[:, ::-1].copy()
+        for column in range(1, self.width):
+            lefts[:, column] += ((lefts[:, column - 1] - column) *
+                                 same_left[:, column - 1])
+        for column in range(self.width - 2, -1, -1):
+            right_gaps[:, column] += (
+                (right_gaps[:, column + 1] - right_gaps[:, column]) *
+                same_left[:, column])
+        for row in range(1, self.height):
+            numpy.maximum(lefts[row], lefts[row - 1] * same_above[row - 1],
+                          out=lefts[row])
+            numpy.maximum(right_gaps[row],
+                          right_gaps[row - 1] * same_above[row - 1],
+                          out=right_gaps[row])
+        return codes, heights, lefts, right_gaps
+
+    def search_max_area_rectangles(self):
+        height, width = self.height, self.width
+        colors_count = len(Color) + 1
+        codes, heights, lefts, right_gaps = self._runs()
+        key_type = numpy.int32
+        if (height * width * colors_count * height * width * (height + 1) >=
+                numpy.iinfo(numpy.int32).max):
+            key_type = numpy.int64
+
+        rows = numpy.arange(height, dtype=key_type).reshape(-1, 1, 1)
+        heights = heights.astype(key_type, copy=False)
+        keys = ((((heights * (width - lefts - right_gaps) * colors_count +
+                   colors_count - codes) * height +
+                  height - 1 - rows) * width + right_gaps) * (height + 1) +
+                height - heights)
+        keys *= heights != 0
+        best = keys.reshape(-1, self.count).max(axis=0)
+
+        rectangle_heights = height - best % (height + 1)
+        best //= height + 1
+        rights = width - 1 - best % width
+        best //= width
+        bottoms = height - 1 - best % height
+        best //= height
+        colors = colors_count - best % colors_count
+        areas = best // colors_count
+
+        found = areas >= self.min_rectangle_area
+        rectangle_heights = numpy.where(found, rectangle_heights, 1)
+        return (numpy.where(found, areas, 0),
+                numpy.where(found, colors, 0),
+                bottoms - rectangle_heights + 1,
+                rights - areas // rectangle_heights + 1, bottoms, rights)
+
+    def max_area_rectangle(self, index):
+        areas, _, tops, lefts, bottoms, rights = \
+            self.search_max_area_rectangles()
+        if not areas[index]:
+            return None
+        return (int(areas[index]),
+                Position(int(tops[index]), int(lefts[index])),
+                Position(int(bottoms[index]), int(rights[index])))
@@ -0,0 +1,85 @@
+class CellsChanged:
+    def __init__(self, cells):
+        self.cells = cells
+
+
+class PieceSpawned:
+    def __init__(self, figure, color, next_figure, next_color):
+        self.figure = figure
+        self.color = color
+        self.next_figure = next_figure
+        self.next_color = next_color
+
+
+class PieceLocked:
+    def __init__(self, figure, color, positions):
+        self.figure = figure
+        self.color = color
+        self.positions = positions
+
+
+class RectangleRemoved:
+    def __init__(self, area, color, top_left, bottom_right):
+        self.area = area
+        self.color = color
+        self.top_left = top_left
+        self.bottom_right = bottom_right
+
+
+class ScoresChanged:
+    def __init__(self, scores):
+        self.scores = scores
+
+
+class LevelChanged:
+    def __init__(self, level):
+        self.level = level
+
+
+class GameOver:
+    def __init__(self, scores):
+        self.scores = scores
+
+
+class GameRestarted:
+    pass
+
+
+class SnapshotRestored:
+    pass
+
+
+class EventDispatcher:
+    def __init__(self, field):
+        self.field = field
+        self.listeners = []
+        self._events = []
+
+    def add_listener(self, listener):
+        if not self.listeners:
+            self.field.track_changes()
+        self.listeners.append(listener)
+
+    def remove_listener(self, listener):
+        self.listeners.remove(listener)
+        if not self.listeners:
+            self._events.clear()
+            self.field._changed_cells = None
+
+    def emit(self, event):
+        if self.listeners:
+            self._events.append(event)
+
+    def flush(self):
+        if not self.listeners:
+            return
+
+        events = []
+        changed_cells = self.field.pop_changed_cells()
+        if changed_cells:
+            events.append(CellsChanged(changed_cells))
+        events.extend(self._events)
+        self._events.clear()
+        if events:
+            for listener in list(self.listeners):
+                listener(events)
@@ -1,10 +1,6 @@
-from model.color import Color
-from model.wall import Wall
 from model.direction import Direction
 from model.figure import Figure
 from model.position import Position
-import random
-import copy
 
 FIGURES_POSITIONS = {
     Figure.I_FIGURE: [(-1, 0), (-2, 0), (-3, 0), (-4, 0)],
@@ -16,149 +12,184 @@ FIGURES_POSITIONS = {
     Figure.N_FIGURE: [(-1, 0), (-2, 0), (-2, 1), (-3, 1)]
 }
 
+DIRECTION_SHIFTS = {
+    Direction.LEFT: (0, -1),
+    Direction.RIGHT: (0, 1),
+    Direction.UP: (-1, 0),
+    Direction.DOWN: (1, 0)
+}
+
+_SHAPES_ROTATIONS = {}
+
+
+def _normalized_shape(offsets):
+    min_row = min(offset[0] for offset in offsets)
+    min_column = min(offset[1] for offset in offsets)
+    return (min_row, min_column), tuple(
+        (row - min_row, column - min_column) for row, column in offsets)
+
+
+def _shape_rotations(shape):
+    key = frozenset(shape)
+    if key not in _SHAPES_ROTATIONS:
+        rotations = [shape]
+        while True:
+            max_column = max(column for _, column in rotations[-1])
+            rotated = tuple((max_column - column, row)
+                            for row, column in rotations[-1])
+            if frozenset(rotated) == key:
+                break
+            rotations.append(rotated)
+
+        rotations = tuple(rotations)
+        rotations_cells = tuple(frozenset(rotation) for rotation in rotations)
+        for index, cells in enumerate(rotations_cells):
+            _SHAPES_ROTATIONS[cells] = (rotations, rotations_cells, index)
+    return _SHAPES_ROTATIONS[key]
+
+
+SPAWN_OFFSETS = {}
+FIGURES_ROTATIONS = {}
+for _figure, _positions in FIGURES_POSITIONS.items():
+    SPAWN_OFFSETS[_figure], _shape = _normalized_shape(_positions)
+    FIGURES_ROTATIONS[_figure] = _shape_rotations(_shape)[:2]
+
 
 class FallingFigure:
-    def __init__(self, logic_model):
-        self.field = logic_model.field
-        self.positions_list, self.color = _random_figure_generate(
-            self.field.width, logic_model)
+    def __init__(self, field, figure, color):
+        self.field = field
+        self.color = color
+        self.rotations, self.rotations_cells = FIGURES_ROTATIONS[figure]
+        self.rotation = 0
+        self.row = SPAWN_OFFSETS[figure][0]
+        self.column = SPAWN_OFFSETS[figure][1] + self.field.width // 2 - 1
         self.display_figure_on_field()
 
+    @property
+    def shape(self):
+        return self.rotations[self.rotation]
+
+    @property
+    def shape_cells(self):
+        return self.rotations_cells[self.rotation]
+
+    @property
+    def positions_list(self):
+        return [Position(self.row + row, self.column + column)
+                for row, column in self.shape]
+
+    @positions_list.setter
+    def positions_list(self, positions):
+        (self.row, self.column), shape = _normalized_shape(
+            [(position.row, position.column) for position in positions])
+        self.rotations, self.rotations_cells, self.rotation = \
+            _shape_rotations(shape)
+
+    @property
+    def state(self):
+        return (self.row, self.column, self.rotations, self.rotations_cells,
+                self.rotation)
+
+    @state.setter
+    def state(self, state):
+        (self.row, self.column, self.rotations, self.rotations_cells,
+         self.rotation) = state
+
     def try_move(self, direction):
         if self.check_move(direction):
             self.remove_figure_from_field()
 
-            for positions in self.positions_list:
-                if direction == Direction.LEFT:
-                    positions.column -= 1
-                elif direction == Direction.RIGHT:
-                    positions.column += 1
-                elif direction == Direction.UP:
-                    positions.row -= 1
-                else:
-                    positions.row += 1
+            delta_row, delta_column = DIRECTION_SHIFTS[direction]
+            self.row += delta_row
+            self.column += delta_column
 
             self.display_figure_on_field()
 
     def check_move(self, direction):
-        for position in self.positions_list:
-            new_row = position.row
-            new_column = position.column
-
-            if direction == Direction.LEFT:
-                new_column -= 1
-            elif direction == Direction.RIGHT:
-                new_column += 1
-            elif direction == Direction.UP:
-                new_row -= 1
-            else:
-                new_row += 1
-
-            if not self._is_valid_position(new_row, new_column):
+        delta_row, delta_column = DIRECTION_SHIFTS[direction]
+        return self._check_position(self.row + delta_row,
+                                    self.column + delta_column, self.shape)
+
+    def _check_position(self, new_row, new_column, shape):
+        for row, column in shape:
+            if not self._is_valid_position(new_row + row,
+                                           new_column + column):
                 return False
 
         return True
 
     def try_rotate_left(self):
-        data_for_rotate = self._check_rotate_left()
-        if data_for_rotate is not None:
+        rotation = self._check_rotate_left()
+        if rotation is not None:
             self.remove_figure_from_field()
-            self.positions_list = data_for_rotate
+            self.rotation = rotation
             self.display_figure_on_field()
 
     def _check_rotate_left(self):
-        min_row = self.field.height
-        min_column = self.field.width
-        for position in self.positions_list:
-            if position.row < min_row:
-                min_row = position.row
-            if position.column < min_column:
-                min_column = position.column
-
-        new_min_row = self.field.height
-        new_min_column = self.field.width
-        new_positions = []
-        for position in self.positions_list:
-            new_row = min_row - (position.column - min_column)
-            new_column = position.row - min_row + min_column
-
-            new_positions.append(Position(new_row, new_column))
-
-            if new_row < new_min_row:
-                new_min_row = new_row
-            if new_column < new_min_column:
-                new_min_column = new_column
-
-        if new_min_row < min_row:
-            for new_position in new_positions:
-                new_position.row += min_row - new_min_row
-        if new_min_column < min_column:
-            for new_position in new_positions:
-                new_position.column += min_column - new_min_column
-
-        for new_position in new_positions:
-            if not self._is_valid_position(
-                    new_position.row, new_position.column):
-                return None
-
-        return new_positions
+        rotation = (self.rotation + 1) % len(self.rotations)
+        if not self._check_position(self.row, self.column,
+                                    self.rotations[rotation]):
+            return None
+
+        return rotation
 
     def _is_valid_position(self, row, column):
         if (row >= self.field.height or
                 not 0 <= column < self.field.width):
             return False
 
-        if self.field.matrix[row][column] == Wall.WALL:
+        if self.field.is_wall(row, column):
             return False
 
-        position_in_figure_flag = False
-        for _position in self.positions_list:
-            if row == _position.row and column == _position.column:
-                position_in_figure_flag = True
-                break
-
-        if (not position_in_figure_flag and
-            row >= 0 and column >= 0 and
-                self.field.matrix[row][column]):
+        if (row >= 0 and column >= 0 and
+                not self.field.is_free(row, column) and
+                (row - self.row, column - self.column) not in
+                self.shape_cells):
             return False
 
         return True
 
     def remove_figure_from_field(self):
-        for position in self.positions_list:
-            if position.row >= 0 and position.column >= 0:
-                self.field.matrix[position.row][position.column] = None
+        for row, column in self.shape:
+            if self.row + row >= 0 and self.column + column >= 0:
+                self.field.set_cell(self.row + row, self.column + column,
+                                    None)
 
     def display_figure_on_field(self):
-        for position in self.positions_list:
-            if position.row >= 0 and position.column >= 0:
-                self.field.matrix[position.row][position.column] = self.color
+        for row, column in self.shape:
+            if self.row + row >= 0 and self.column + column >= 0:
+                self.field.set_cell(self.row + row, self.column + column,
+                                    self.color)
+
+    def drop_distance(self):
+        distance = 0
+        while self.row + distance < 0:
+            if not self._check_position(self.row + distance + 1,
+                                        self.column, self.shape):
+                return distance
+            distance += 1
+
+        own_masks = {}
+        for row, column in self.shape:
+            if self.row + row >= 0:
+                own_masks[column] = (own_masks.get(column, 0) |
+                                     1 << (self.row + row))
+
+        free_cells = self.field.height
+        for row, column in self.shape:
+            free_cells = min(free_cells, self.field.free_cells_below(
+                self.row + distance + row, self.column + column,
+                own_masks.get(column, 0)))
+        return distance + free_cells
+
+    def ghost_positions(self):
+        row = self.row + self.drop_distance()
+        return [Position(row + figure_row, self.column + figure_column)
+                for figure_row, figure_column in self.shape]
 
     def drop_figure(self):
-        while self.check_move(Direction.DOWN):
-            self.try_move(Direction.DOWN)
-
-
-def _random_figure_generate(field_width, logic_model):
-    figures_list = list(FIGURES_POSITIONS.keys())
-
-    if logic_model.current_figure is not None:
-        logic_model.current_figure = logic_model.next_figure
-        logic_model.current_color = logic_model.next_color
-    else:
-        logic_model.current_figure = random.choice(figures_list)
-        logic_model.current_color = random.choice(list(Color))
-
-    figures_list.remove(logic_model.current_figure)
-    logic_model.next_figure = random.choice(figures_list)
-    logic_model.next_color = random.choice(list(Color))
-
-    figure_positions = copy.deepcopy(
-        FIGURES_POSITIONS[logic_model.current_figure])
-
-    shift_positions = []
-    shift = field_width // 2 - 1
-    for position in figure_positions:
-        shift_positions.append(Position(position[0], position[1] + shift))
-
-    return shift_positions, logic_model.current_color
+        distance = self.drop_distance()
+        if distance:
+            self.remove_figure_from_field()
+            self.row += distance
+            self.display_figure_on_field()
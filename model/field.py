@@ -1,36 +1,306 @@
 from model.wall import Wall
 from model.color import Color
 from model.position import Position
+from model.events import RectangleRemoved
+import random
+
+_HASH_MASK = (1 << 64) - 1
+_ITEMS_FACTORS = {
+    item: random.Random(index).getrandbits(64) | 1
+    for index, item in enumerate([Wall.WALL] + list(Color))
+}
+_COLORS = list(Color)
+_ITEMS_INDEXES = {
+    item: (_ITEMS_FACTORS[item],
+           _COLORS.index(item) if item in _COLORS else None)
+    for item in _ITEMS_FACTORS
+}
+_ZOBRIST_KEYS = {}
+
+
+def _zobrist_keys(width, height):
+    if (width, height) not in _ZOBRIST_KEYS:
+        generator = random.Random(width * 1000003 + height)
+        _ZOBRIST_KEYS[width, height] = [
+            generator.getrandbits(64) for _ in range(width * height)]
+    return _ZOBRIST_KEYS[width, height]
+
+
+def alternating_walls(width, height, generator):
+    return [(row, 0 if row % 2 == 0 else width - 1) for row in range(height)]
+
+
+def no_walls(width, height, generator):
+    return []
+
+
+def random_walls(width, height, generator):
+    walls = []
+    for row in range(height):
+        side = generator.randrange(3)
+        if side < 2:
+            walls.append((row, 0 if side == 0 else width - 1))
+    return walls
+
+
+WALL_PATTERNS = {
+    'alternating': alternating_walls,
+    'none': no_walls,
+    'random': random_walls
+}
+
+
+class FieldSnapshot:
+    def __init__(self, position, scores, destroyed_rectangles_count,
+                 current_level, dirty_region):
+        self.position = position
+        self.scores = scores
+        self.destroyed_rectangles_count = destroyed_rectangles_count
+        self.current_level = current_level
+        self.dirty_region = dirty_region
 
 
 class Field:
-    def __init__(self, width, height):
+    def __init__(self, width, height, full_scan=False,
+                 min_rectangle_area=None, walls='alternating', walls_seed=0):
         self.width = width
         self.height = height
-        self.matrix = self._matrix_with_walls_create()
+        if min_rectangle_area is None:
+            min_rectangle_area = max(1, width - 1)
+        if min_rectangle_area < 1:
+            raise ValueError('Minimum rectangle area must be positive')
+        self.min_rectangle_area = min_rectangle_area
+        self.walls = walls
+        self.walls_seed = walls_seed
+        self._zobrist_keys = _zobrist_keys(width, height)
+        self._changed_cells = None
+        self._journal = None
+        self._journal_offset = 0
+        self._snapshots = []
+        self.events = None
+        self._load_matrix(self._matrix_with_walls_create())
+        self._rebuild_indexes()
         self.scores = 0
         self.destroyed_rectangles_count = 0
         self.current_level = 1
 
+        self.full_scan = full_scan
+        self._dirty_region = None
+
+        self._scan_heights = [0 for _ in range(width)]
+        self._scan_stack = []
+        self._scan_rectangles = {color: None for color in Color}
+
     def _matrix_with_walls_create(self):
         matrix = [[None for _ in range(self.width)] for _ in range(
                   self.height)]
-        for i in range(self.height):
-            if i % 2 == 0:
-                matrix[i][0] = Wall.WALL
-            else:
-                matrix[i][self.width - 1] = Wall.WALL
+        for row, column in WALL_PATTERNS[self.walls](
+                self.width, self.height, random.Random(self.walls_seed)):
+            matrix[row][column] = Wall.WALL
 
         return matrix
 
-    def remove_completed_rectangle(self, falling_figure):
+    def _load_matrix(self, matrix):
+        self._matrix = matrix
+
+    def _rebuild_indexes(self):
+        self._column_masks = [0 for _ in range(self.width)]
+        self._wall_masks = [0 for _ in range(self.width)]
+        self._row_counts = [0 for _ in range(self.height)]
+        self._color_counts = [0 for _ in _COLORS]
+        self.hash = 0
+        for row in range(self.height):
+            for column, item in enumerate(self._row(row)):
+                if item is None:
+                    continue
+                self._column_masks[column] |= 1 << row
+                self.hash ^= self._item_key(row, column, item)
+                if item is Wall.WALL:
+                    self._wall_masks[column] |= 1 << row
+                else:
+                    self._row_counts[row] += 1
+                    self._color_counts[_ITEMS_INDEXES[item][1]] += 1
+        self._mark_all_changed()
+
+    def _mark_all_changed(self):
+        if self._changed_cells is not None:
+            self._changed_cells.update(
+                (row, column) for row in range(self.height)
+                for column in range(self.width))
+
+    def _item_key(self, row, column, item):
+        if item is None:
+            return 0
+        return (self._zobrist_keys[row * self.width + column] *
+                _ITEMS_FACTORS[item]) & _HASH_MASK
+
+    @property
+    def matrix(self):
+        return self._matrix
+
+    @matrix.setter
+    def matrix(self, matrix):
+        if self._snapshots:
+            raise ValueError('Cannot replace the matrix with open snapshots')
+        self._journal = None
+        self._load_matrix(matrix)
+        self._rebuild_indexes()
+        self.mark_dirty(0, 0, self.height - 1, self.width - 1)
+
+    def get_cell(self, row, column):
+        return self._matrix[row][column]
+
+    def set_cell(self, row, column, item):
+        old_item = self.get_cell(row, column)
+        if old_item is item:
+            return
+
+        self._store(row, column, item)
+        if self._journal is not None:
+            self._journal.append((row, column, old_item))
+        if self._changed_cells is not None:
+            self._changed_cells.add((row, column))
+        key = self._zobrist_keys[row * self.width + column]
+        bit = 1 << row
+        if old_item is not None:
+            factor, color_index = _ITEMS_INDEXES[old_item]
+            self.hash ^= key * factor & _HASH_MASK
+            if color_index is None:
+                self._wall_masks[column] &= ~bit
+            else:
+                self._row_counts[row] -= 1
+                self._color_counts[color_index] -= 1
+        if item is None:
+            self._column_masks[column] &= ~bit
+        else:
+            factor, color_index = _ITEMS_INDEXES[item]
+            self.hash ^= key * factor & _HASH_MASK
+            self._column_masks[column] |= bit
+            if color_index is None:
+                self._wall_masks[column] |= bit
+            else:
+                self._row_counts[row] += 1
+                self._color_counts[color_index] += 1
+
+    def _store(self, row, column, item):
+        self._matrix[row][column] = item
+
+    def is_free(self, row, column):
+        return self._matrix[row][column] is None
+
+    def is_wall(self, row, column):
+        return self._matrix[row][column] is Wall.WALL
+
+    def _row(self, row):
+        return self._matrix[row]
+
+    def column_height(self, column):
+        blocks = self._column_masks[column] & ~self._wall_masks[column]
+        if not blocks:
+            return 0
+        return self.height - (blocks & -blocks).bit_length() + 1
+
+    def row_count(self, row):
+        return self._row_counts[row]
+
+    def color_count(self, color):
+        return self._color_counts[_ITEMS_INDEXES[color][1]]
+
+    def track_changes(self):
+        self._changed_cells = set()
+        self._rebuild_indexes()
+
+    def pop_changed_cells(self):
+        changed_cells = self._changed_cells
+        if changed_cells is not None:
+            self._changed_cells = set()
+        return changed_cells
+
+    def snapshot(self):
+        if self._journal is None:
+            self._journal = []
+            self._journal_offset = 0
+        snapshot = FieldSnapshot(self._journal_offset + len(self._journal),
+                                 self.scores, self.destroyed_rectangles_count,
+                                 self.current_level, self._dirty_region)
+        self._snapshots.append(snapshot)
+        return snapshot
+
+    def _snapshot_index(self, snapshot):
+        for index in range(len(self._snapshots) - 1, -1, -1):
+            if self._snapshots[index] is snapshot:
+                return index
+        raise ValueError('Snapshot was released or rolled back')
+
+    def restore(self, snapshot):
+        del self._snapshots[self._snapshot_index(snapshot) + 1:]
+        journal = self._journal
+        position = snapshot.position - self._journal_offset
+        self._journal = None
+        try:
+            while len(journal) > position:
+                self.set_cell(*journal.pop())
+        finally:
+            self._journal = journal
+
+        self.scores = snapshot.scores
+        self.destroyed_rectangles_count = snapshot.destroyed_rectangles_count
+        self.current_level = snapshot.current_level
+        self._dirty_region = snapshot.dirty_region
+
+    def release(self, snapshot):
+        index = self._snapshot_index(snapshot)
+        del self._snapshots[index]
+        if not self._snapshots:
+            self._journal = None
+        elif index == 0:
+            position = self._snapshots[0].position - self._journal_offset
+            del self._journal[:position]
+            self._journal_offset += position
+
+    def free_cells_below(self, row, column, ignored_mask=0):
+        below = (self._column_masks[column] & ~ignored_mask) >> (row + 1)
+        if not below:
+            return self.height - row - 1
+        return (below & -below).bit_length() - 1
+
+    def mark_dirty(self, top, left, bottom, right):
+        top = max(top, 0)
+        left = max(left, 0)
+        bottom = min(bottom, self.height - 1)
+        right = min(right, self.width - 1)
+        if top > bottom or left > right:
+            return
+
+        if self._dirty_region is not None:
+            top = min(top, self._dirty_region[0])
+            left = min(left, self._dirty_region[1])
+            bottom = max(bottom, self._dirty_region[2])
+            right = max(right, self._dirty_region[3])
+        self._dirty_region = (top, left, bottom, right)
+
+    def mark_positions_dirty(self, positions):
+        for position in positions:
+            self.mark_dirty(position.row, position.column,
+                            position.row, position.column)
+
+    def remove_completed_rectangle(self, falling_figure=None):
+        if falling_figure is not None:
+            self.mark_positions_dirty(falling_figure.positions_list)
+
         completed_rectangle = self._search_max_area_rectangle()
         while completed_rectangle:
+            if self.events is not None:
+                self.events.emit(RectangleRemoved(
+                    completed_rectangle[0],
+                    self.get_cell(completed_rectangle[1].row,
+                                  completed_rectangle[1].column),
+                    completed_rectangle[1], completed_rectangle[2]))
             for row in range(completed_rectangle[1].row,
                              completed_rectangle[2].row + 1):
                 for column in range(completed_rectangle[1].column,
                                     completed_rectangle[2].column + 1):
-                    self.matrix[row][column] = None
+                    self.set_cell(row, column, None)
 
             self._move_down_after_remove_rectangle(completed_rectangle,
                                                    falling_figure)
@@ -42,27 +312,60 @@ class Field:
 
             completed_rectangle = self._search_max_area_rectangle()
 
+        self._dirty_region = None
+
     def _move_down_after_remove_rectangle(self, removed_rectangle,
                                           falling_figure):
-        falling_figure.remove_figure_from_field()
-        for row in range(removed_rectangle[1].row - 1, -1, -1):
-            for column in range(removed_rectangle[1].column,
-                                removed_rectangle[2].column + 1):
-                rectangle_height = (removed_rectangle[2].row -
-                                    removed_rectangle[1].row + 1)
-                if self.matrix[row][column] is not Wall.WALL:
-                    self.matrix[row + rectangle_height][column] =\
-                        self.matrix[row][column]
-                    self.matrix[row][column] = None
+        if falling_figure is not None:
+            falling_figure.remove_figure_from_field()
+        top, left = removed_rectangle[1].row, removed_rectangle[1].column
+        bottom, right = removed_rectangle[2].row, removed_rectangle[2].column
+        self.mark_dirty(0, left, bottom, right)
+
+        rectangle_height = bottom - top + 1
+        above_mask = (1 << top) - 1
+        for column in range(left, right + 1):
+            occupied = self._column_masks[column] & above_mask
+            if not occupied:
+                continue
+            first_row = (occupied & -occupied).bit_length() - 1
+            start_row = max(0, first_row - rectangle_height)
+            items = [None] * start_row + [self.get_cell(row, column) for row
+                                          in range(start_row, top)]
+            for row in range(bottom, first_row - 1, -1):
+                source_row = row - rectangle_height
+                if source_row >= 0 and items[source_row] is not Wall.WALL:
+                    item = items[source_row]
+                elif row < top and items[row] is not Wall.WALL:
+                    item = None
+                else:
+                    continue
+                if row >= top or items[row] is not item:
+                    self.set_cell(row, column, item)
 
     def _search_max_area_rectangle(self):
+        if self.full_scan:
+            region = (0, 0, self.height - 1, self.width - 1)
+        elif self._dirty_region is None:
+            return None
+        else:
+            region = self._dirty_region
+
+        skipped_colors = tuple(
+            color for color, count in zip(_COLORS, self._color_counts)
+            if count < self.min_rectangle_area)
+        if len(skipped_colors) == len(_COLORS):
+            return None
+
         max_area_rectangle = (0, None, None)
+        rectangles = self._search_completed_rectangles(region,
+                                                       skipped_colors)
         for rectangle_color in list(Color):
-            rectangle = self._search_completed_color_rectangle(rectangle_color)
+            rectangle = rectangles[rectangle_color]
             if rectangle[0] > max_area_rectangle[0]:
                 max_area_rectangle = rectangle
 
-        if max_area_rectangle[0] >= self.width - 1:
+        if max_area_rectangle[0] >= self.min_rectangle_area:
             max_area_rectangle = (max_area_rectangle[0],
                                   Position(max_area_rectangle[1][0],
                                            max_area_rectangle[1][1]),
@@ -72,7 +375,128 @@ class Field:
             return None
         return max_area_rectangle
 
+    def _search_completed_rectangles(self, region, skipped_colors=()):
+        top, left, bottom, right = region
+        row_counts = self._row_counts
+        heights = self._scan_heights
+        stack = self._scan_stack
+        best = self._scan_rectangles
+        for color in best:
+            best[color] = (0, self.height, self.width, self.height, 0)
+
+        previous_items = self._row(top - 1) if top > 0 else None
+        for column in range(self.width):
+            heights[column] = 0
+            if previous_items is None:
+                continue
+            item = previous_items[column]
+            if item is None or item is Wall.WALL or item in skipped_colors:
+                continue
+            row = top - 1
+            while row >= 0 and self.get_cell(row, column) is item:
+                heights[column] += 1
+                row -= 1
+
+        for row in range(top, self.height):
+            items = self._row(row)
+            if not row_counts[row]:
+                if row >= bottom:
+                    break
+                heights[:] = [0] * self.width
+                previous_items = items
+                continue
+
+            for column in range(self.width):
+                item = items[column]
+                if item is None or item is Wall.WALL or \
+                        item in skipped_colors:
+                    heights[column] = 0
+                elif previous_items is not None and \
+                        previous_items[column] is item:
+                    heights[column] += 1
+                else:
+                    heights[column] = 1
+            previous_items = items
+
+            min_height = row - bottom + 1
+            if min_height > 0 and max(heights[left:right + 1]) < min_height:
+                break
+
+            stack_color = None
+            segment_start = 0
+            for column in range(self.width + 1):
+                if column < self.width and heights[column]:
+                    item = items[column]
+                    height = heights[column]
+                else:
+                    item = None
+                    height = 0
+
+                if item is not stack_color:
+                    height = 0
+                while stack and heights[stack[-1]] >= height:
+                    bar_height = heights[stack.pop()]
+                    bar_left = stack[-1] + 1 if stack else segment_start
+                    if (bar_height < min_height or bar_left > right or
+                            column <= left):
+                        continue
+                    area = bar_height * (column - bar_left)
+                    rectangle = best[stack_color]
+                    if (area > rectangle[0] or
+                            area == rectangle[0] and
+                            (row, column - 1, bar_height) < rectangle[1:4]):
+                        best[stack_color] = (area, row, column - 1,
+                                             bar_height, bar_left)
+
+                if item is not stack_color:
+                    stack_color = item
+                    segment_start = column
+                if item is not None:
+                    stack.append(column)
+
+        rectangles = {}
+        for color, (area, row, column, height, start) in best.items():
+            if area:
+                rectangles[color] = (area, (row - height + 1, start),
+                                     (row, column))
+            else:
+                rectangles[color] = (0, [])
+        return rectangles
+
     def _search_completed_color_rectangle(self, rectangle_color):
+        max_area_rectangle = (0, [])
+        heights = [0 for _ in range(self.width)]
+        stack = []
+
+        for row in range(self.height):
+            for column in range(self.width):
+                if self.get_cell(row, column) == rectangle_color:
+                    heights[column] += 1
+                else:
+                    heights[column] = 0
+
+            row_rectangle = (0, self.width, self.height, 0)
+            for column in range(self.width + 1):
+                height = heights[column] if column < self.width else 0
+                while stack and heights[stack[-1]] >= height:
+                    bar_height = heights[stack.pop()]
+                    left = stack[-1] + 1 if stack else 0
+                    area = bar_height * (column - left)
+                    if (area > row_rectangle[0] or
+                            area == row_rectangle[0] and
+                            (column - 1, bar_height) <
+                            row_rectangle[1:3]):
+                        row_rectangle = (area, column - 1, bar_height, left)
+                stack.append(column)
+            stack.clear()
+
+            if row_rectangle[0] > max_area_rectangle[0]:
+                area, right, height, left = row_rectangle
+                max_area_rectangle = (area, (row - height + 1, left),
+                                      (row, right))
+        return max_area_rectangle
+
+    def _search_completed_color_rectangle_reference(self, rectangle_color):
         skipped_items = [None, Wall.WALL]
         for _color in list(Color):
             if _color != rectangle_color:
@@ -86,7 +510,7 @@ class Field:
 
         for row in range(self.height):
             for column in range(self.width):
-                if self.matrix[row][column] in skipped_items:
+                if self.get_cell(row, column) in skipped_items:
                     continue
 
                 if row == 0:
@@ -114,10 +538,25 @@ class Field:
                         )
         return max_area_rectangle
 
+    def copy(self):
+        clone = type(self)(self.width, self.height, self.full_scan,
+                           self.min_rectangle_area, self.walls,
+                           self.walls_seed)
+        clone.matrix = [list(items) for items in self.matrix]
+        clone._dirty_region = self._dirty_region
+        clone.scores = self.scores
+        clone.destroyed_rectangles_count = self.destroyed_rectangles_count
+        clone.current_level = self.current_level
+        return clone
+
     def clear_field(self):
         for row in range(self.height):
-            for column in range(self.width):
-                if self.matrix[row][column] is not Wall.WALL:
-                    self.matrix[row][column] = None
+            if not self._row_counts[row]:
+                continue
+            for column, item in enumerate(self._row(row)):
+                if item is not None and item is not Wall.WALL:
+                    self.set_cell(row, column, None)
 
+        self._mark_all_changed()
         self.scores = 0
+        self._dirty_region = None
@@ -0,0 +1,94 @@
+from model.color import Color
+from model.figure import Figure
+from collections import deque
+import random
+
+
+class NeverRepeatStrategy:
+    def __init__(self):
+        self.previous_figure = None
+
+    def next_figure(self, random_generator):
+        figures_list = list(Figure)
+        if self.previous_figure is not None:
+            figures_list.remove(self.previous_figure)
+        self.previous_figure = random_generator.choice(figures_list)
+        return self.previous_figure
+
+
+class BagStrategy:
+    def __init__(self):
+        self.bag = []
+
+    def next_figure(self, random_generator):
+        if not self.bag:
+            self.bag = list(Figure)
+            random_generator.shuffle(self.bag)
+        return self.bag.pop()
+
+
+class UniformStrategy:
+    def next_figure(self, random_generator):
+        return random_generator.choice(list(Figure))
+
+
+STRATEGIES = {
+    'never_repeat': NeverRepeatStrategy,
+    'bag': BagStrategy,
+    'uniform': UniformStrategy
+}
+
+
+class FigureGenerator:
+    def __init__(self, seed=None, strategy='never_repeat'):
+        if seed is None:
+            seed = random.randrange(2 ** 32)
+        self.seed = seed
+        self.random = random.Random(seed)
+        if isinstance(strategy, str):
+            strategy = STRATEGIES[strategy]()
+        self.strategy = strategy
+        self._queue = deque()
+        self._consumed = 0
+        self._history = None
+        self._history_start = 0
+
+    def _generate(self):
+        figure = self.strategy.next_figure(self.random)
+        color = self.random.choice(list(Color))
+        self._queue.append((figure, color))
+        if self._history is not None:
+            self._history.append((figure, color))
+
+    def next(self):
+        if not self._queue:
+            self._generate()
+        self._consumed += 1
+        return self._queue.popleft()
+
+    def peek(self, count=1):
+        while len(self._queue) < count:
+            self._generate()
+        return [self._queue[index] for index in range(count)]
+
+    def get_state(self):
+        if self._history is None:
+            self._history = list(self._queue)
+            self._history_start = self._consumed
+        return self._consumed
+
+    def set_state(self, consumed):
+        self._consumed = consumed
+        self._queue = deque(self._history[consumed - self._history_start:])
+
+    def release_state(self, consumed=None):
+        if consumed is None:
+            self._history = None
+            return
+        del self._history[:consumed - self._history_start]
+        self._history_start = consumed
+
+    def generate(self, count):
+        self.peek(count)
+        self._consumed += count
+        return [self._queue.popleft() for _ in range(count)]
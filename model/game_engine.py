@@ -0,0 +1,136 @@
+from collections import deque
+
+from model.action import Action
+from model.colors_modes import ColorsModes
+from model.direction import Direction
+from model.events import GameOver, GameRestarted, LevelChanged, ScoresChanged
+
+
+class GameEngine:
+    MODES_MULCT = {
+        ColorsModes.OFF: 1,
+        ColorsModes.GRAY: 0.75,
+        ColorsModes.ON: 0.6
+    }
+
+    TICK_TIME = 500
+    SPEED_UP = 0.85
+    UNDO_DEPTH = 16
+
+    def __init__(self, logic_model, color_mode=ColorsModes.ON,
+                 undo_depth=0):
+        self.logic_model = logic_model
+        self.color_mode = color_mode
+        self.tick_time = self.TICK_TIME
+        self.current_level = logic_model.field.current_level
+        self.current_scores = 0
+        self.ticks = 0
+        self.game_over = False
+        self.undo_depth = undo_depth
+        self.history = deque()
+        self._remember_figure()
+
+    def _remember_figure(self):
+        if not self.undo_depth or (
+                self.history and self.history[-1][0].figures_count ==
+                self.logic_model.figures_count):
+            return
+
+        self.history.append((self.logic_model.snapshot(),
+                             self.current_scores, self.current_level,
+                             self.tick_time))
+        if len(self.history) > self.undo_depth + 1:
+            self.logic_model.release(self.history.popleft()[0])
+
+    def _forget_figures(self):
+        while self.history:
+            self.logic_model.release(self.history.pop()[0])
+
+    def undo(self):
+        if self.game_over or len(self.history) < 2:
+            return False
+
+        self.logic_model.release(self.history.pop()[0])
+        snapshot, self.current_scores, self.current_level, self.tick_time = \
+            self.history[-1]
+        self.logic_model.restore(snapshot)
+        self.logic_model.events.flush()
+        return True
+
+    def set_color_mode(self, color_mode):
+        if self.logic_model.fell_flag:
+            return False
+
+        self.color_mode = color_mode
+        return True
+
+    def apply(self, action):
+        if self.game_over:
+            return
+
+        falling_figure = self.logic_model.falling_figure
+        if action == Action.LEFT:
+            falling_figure.try_move(Direction.LEFT)
+        elif action == Action.RIGHT:
+            falling_figure.try_move(Direction.RIGHT)
+        elif action == Action.DOWN:
+            falling_figure.try_move(Direction.DOWN)
+        elif action == Action.ROTATE:
+            falling_figure.try_rotate_left()
+        elif action == Action.DROP:
+            self.logic_model.drop()
+        self._remember_figure()
+        self.logic_model.events.flush()
+
+    def tick(self):
+        if self.game_over:
+            return False
+        if self.logic_model.end_of_the_game():
+            self.game_over = True
+            self.logic_model.events.emit(
+                GameOver(self.logic_model.field.scores))
+            self.logic_model.events.flush()
+            return False
+
+        field = self.logic_model.field
+        self.logic_model.update()
+        self.ticks += 1
+
+        if self.current_scores < field.scores:
+            field.scores = round(field.scores *
+                                 self.MODES_MULCT[self.color_mode])
+            self.current_scores = field.scores
+            self.logic_model.events.emit(ScoresChanged(field.scores))
+
+        if self.current_level < field.current_level:
+            self.current_level += 1
+            self.tick_time *= self.SPEED_UP
+            self.logic_model.events.emit(LevelChanged(self.current_level))
+
+        self._remember_figure()
+        self.logic_model.events.flush()
+        return True
+
+    def run(self, inputs=(), max_ticks=None):
+        inputs = iter(inputs)
+        pending = next(inputs, None)
+        start_ticks = self.ticks
+        while max_ticks is None or self.ticks - start_ticks < max_ticks:
+            while pending is not None and pending[0] <= self.ticks:
+                self.apply(pending[1])
+                pending = next(inputs, None)
+
+            if not self.tick():
+                break
+
+        return self.ticks - start_ticks
+
+    def restart(self):
+        self._forget_figures()
+        self.logic_model.restart()
+        self.current_scores = 0
+        self.ticks = 0
+        self.game_over = False
+        self._remember_figure()
+        self.logic_model.events.emit(GameRestarted())
+        self.logic_model.events.flush()
@@ -0,0 +1,98 @@
+from model.action import Action
+from collections import deque
+
+
+class FrameTimings:
+    def __init__(self, size=120):
+        self.intervals = deque(maxlen=size)
+        self.work_times = deque(maxlen=size)
+
+    def record(self, interval, work_time):
+        self.intervals.append(interval)
+        self.work_times.append(work_time)
+
+    @property
+    def fps(self):
+        total = sum(self.intervals)
+        return 1000 * len(self.intervals) / total if total else 0
+
+    @property
+    def average_work_time(self):
+        if not self.work_times:
+            return 0
+        return sum(self.work_times) / len(self.work_times)
+
+    @property
+    def max_work_time(self):
+        return max(self.work_times, default=0)
+
+
+class GameLoop:
+    DELAYED_AUTO_SHIFT = 170
+    AUTO_REPEAT_RATE = 50
+    MAX_FRAME_TIME = 250
+    REPEATED_ACTIONS = (Action.LEFT, Action.RIGHT, Action.DOWN)
+
+    def __init__(self, engine, on_action=None, before_tick=None,
+                 delayed_auto_shift=DELAYED_AUTO_SHIFT,
+                 auto_repeat_rate=AUTO_REPEAT_RATE):
+        self.engine = engine
+        self.on_action = on_action
+        self.before_tick = before_tick
+        self.delayed_auto_shift = delayed_auto_shift
+        self.auto_repeat_rate = auto_repeat_rate
+        self.time = 0
+        self.accumulator = 0
+        self.running = True
+        self._repeats = {}
+
+    def reset(self):
+        self.accumulator = 0
+        self.running = True
+        self._repeats.clear()
+
+    def apply(self, action):
+        if self.engine.game_over:
+            return
+        if self.on_action is not None:
+            self.on_action(self.engine.ticks, action)
+        self.engine.apply(action)
+
+    def press(self, action):
+        self.apply(action)
+        if action in self.REPEATED_ACTIONS:
+            self._repeats[action] = self.time + self.delayed_auto_shift
+
+    def release(self, action):
+        self._repeats.pop(action, None)
+
+    def advance(self, elapsed):
+        end_time = self.time + min(elapsed, self.MAX_FRAME_TIME)
+        ticks = 0
+        while self.running:
+            tick_time = self.time + self.engine.tick_time - self.accumulator
+            repeat_time = min(self._repeats.values(), default=end_time + 1)
+            if min(tick_time, repeat_time) > end_time:
+                break
+
+            if repeat_time <= tick_time:
+                self.accumulator += repeat_time - self.time
+                self.time = repeat_time
+                for action, time in list(self._repeats.items()):
+                    if time == repeat_time:
+                        self._repeats[action] = time + self.auto_repeat_rate
+                        self.apply(action)
+                continue
+
+            self.time = tick_time
+            self.accumulator = 0
+            if self.before_tick is not None and not self.before_tick():
+                self.running = False
+                break
+            self.engine.tick()
+            ticks += 1
+
+        if self.running:
+            self.accumulator += end_time - self.time
+            self.time = end_time
+        return ticks
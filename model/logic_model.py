@@ -1,30 +1,122 @@
 from model.direction import Direction
 from model import field, falling_figure
+from model.figure_generator import FigureGenerator
+from model.events import (
+    EventDispatcher, PieceLocked, PieceSpawned, SnapshotRestored)
+
+
+class LogicModelSnapshot:
+    def __init__(self, logic_model):
+        self.field = logic_model.field.snapshot()
+        self.falling_figure = logic_model.falling_figure
+        self.falling_figure_state = logic_model.falling_figure.state
+        self.current_figure = logic_model.current_figure
+        self.current_color = logic_model.current_color
+        self.next_figure = logic_model.next_figure
+        self.next_color = logic_model.next_color
+        self.figures_count = logic_model.figures_count
+        self.fell_flag = logic_model.fell_flag
+        self.generator_state = logic_model.generator.get_state()
 
 
 class LogicModel:
     __FIELD_WIDTH = 10
     __FIELD_HEIGHT = 20
 
-    def __init__(self, width=__FIELD_WIDTH, height=__FIELD_HEIGHT):
+    def __init__(self, width=__FIELD_WIDTH, height=__FIELD_HEIGHT,
+                 field_type=field.Field, generator=None,
+                 min_rectangle_area=None, walls='alternating', walls_seed=0):
+        if generator is None:
+            generator = FigureGenerator()
+        self.generator = generator
+
         self.current_figure = None
         self.current_color = None
         self.next_figure = None
         self.next_color = None
 
-        self.field = field.Field(width, height)
-        self.falling_figure = falling_figure.FallingFigure(self)
+        self.field = field_type(width, height,
+                                min_rectangle_area=min_rectangle_area,
+                                walls=walls, walls_seed=walls_seed)
+        self.events = EventDispatcher(self.field)
+        self.field.events = self.events
+        self.figures_count = 0
+        self._snapshots = []
+        self._spawn_figure()
         self.fell_flag = False
 
+    def _spawn_figure(self):
+        self.current_figure, self.current_color = self.generator.next()
+        self.next_figure, self.next_color = self.generator.peek()[0]
+        self.falling_figure = falling_figure.FallingFigure(
+            self.field, self.current_figure, self.current_color)
+        self.figures_count += 1
+        self.events.emit(PieceSpawned(self.current_figure, self.current_color,
+                                      self.next_figure, self.next_color))
+
+    def _lock_figure(self):
+        positions = self.falling_figure.positions_list
+        self.field.mark_positions_dirty(positions)
+        self.events.emit(PieceLocked(self.current_figure, self.current_color,
+                                     positions))
+
     def update(self):
         if self.falling_figure.check_move(Direction.DOWN):
             self.falling_figure.try_move(Direction.DOWN)
         else:
             self.fell_flag = True
-            self.falling_figure = falling_figure.FallingFigure(self)
+            self._lock_figure()
+            self._spawn_figure()
             self.falling_figure.try_move(Direction.DOWN)
             self.field.remove_completed_rectangle(self.falling_figure)
 
+    def drop(self):
+        self.falling_figure.drop_figure()
+        self._lock_figure()
+        self._spawn_figure()
+        self.field.remove_completed_rectangle(self.falling_figure)
+        self.fell_flag = True
+
+    def snapshot(self):
+        snapshot = LogicModelSnapshot(self)
+        self._snapshots.append(snapshot)
+        return snapshot
+
+    def _snapshot_index(self, snapshot):
+        for index in range(len(self._snapshots) - 1, -1, -1):
+            if self._snapshots[index] is snapshot:
+                return index
+        raise ValueError('Snapshot was released or rolled back')
+
+    def restore(self, snapshot):
+        del self._snapshots[self._snapshot_index(snapshot) + 1:]
+        self.field.restore(snapshot.field)
+        self.falling_figure = snapshot.falling_figure
+        self.falling_figure.state = snapshot.falling_figure_state
+        self.current_figure = snapshot.current_figure
+        self.current_color = snapshot.current_color
+        self.next_figure = snapshot.next_figure
+        self.next_color = snapshot.next_color
+        self.figures_count = snapshot.figures_count
+        self.fell_flag = snapshot.fell_flag
+        self.generator.set_state(snapshot.generator_state)
+        self.events.emit(SnapshotRestored())
+
+    def release(self, snapshot):
+        index = self._snapshot_index(snapshot)
+        self.field.release(snapshot.field)
+        del self._snapshots[index]
+        if not self._snapshots:
+            self.generator.release_state()
+        elif index == 0:
+            self.generator.release_state(self._snapshots[0].generator_state)
+
+    def restart(self):
+        self.field.clear_field()
+        self.figures_count = 0
+        self._spawn_figure()
+        self.fell_flag = False
+
     def end_of_the_game(self):
         figure_not_on_field_flag = False
         for position in self.falling_figure.positions_list:
@@ -0,0 +1,132 @@
+from functools import wraps
+from time import perf_counter
+import json
+import marshal
+
+from model.falling_figure import FallingFigure
+from model.field import Field
+
+
+HOT_PATHS = [
+    (FallingFigure, 'check_move'),
+    (FallingFigure, '_is_valid_position'),
+    (FallingFigure, '_check_rotate_left'),
+    (Field, '_search_max_area_rectangle'),
+    (Field, 'remove_completed_rectangle')
+]
+
+
+class FunctionStats:
+    def __init__(self, function):
+        code = function.__code__
+        self.name = function.__qualname__
+        self.key = (code.co_filename, code.co_firstlineno, self.name)
+        self.calls = 0
+        self.total_time = 0
+        self.own_time = 0
+        self.callers = {}
+
+    def add(self, elapsed, own_time, caller):
+        self.calls += 1
+        self.total_time += elapsed
+        self.own_time += own_time
+        if caller is not None:
+            caller_stats = self.callers.get(caller.key)
+            if caller_stats is None:
+                caller_stats = self.callers[caller.key] = [0, 0, 0]
+            caller_stats[0] += 1
+            caller_stats[1] += own_time
+            caller_stats[2] += elapsed
+
+    def reset(self):
+        self.calls = 0
+        self.total_time = 0
+        self.own_time = 0
+        self.callers.clear()
+
+
+class Profiler:
+    def __init__(self):
+        self.stats = {}
+        self._originals = {}
+        self._stack = []
+
+    @property
+    def enabled(self):
+        return bool(self._originals)
+
+    def instrument(self, owner, name):
+        if (owner, name) in self._originals:
+            return
+        function = owner.__dict__[name]
+        stats = self.stats.get(function.__qualname__)
+        if stats is None:
+            stats = self.stats[function.__qualname__] = \
+                FunctionStats(function)
+        self._originals[(owner, name)] = function
+        setattr(owner, name, self._wrap(function, stats))
+
+    def enable(self, hot_paths=HOT_PATHS):
+        for owner, name in hot_paths:
+            self.instrument(owner, name)
+
+    def disable(self):
+        for (owner, name), function in self._originals.items():
+            setattr(owner, name, function)
+        self._originals.clear()
+
+    def reset(self):
+        for stats in self.stats.values():
+            stats.reset()
+
+    def _wrap(self, function, stats):
+        stack = self._stack
+
+        @wraps(function)
+        def wrapper(*args, **kwargs):
+            frame = [stats, 0]
+            stack.append(frame)
+            start_time = perf_counter()
+            try:
+                return function(*args, **kwargs)
+            finally:
+                elapsed = perf_counter() - start_time
+                stack.pop()
+                caller = None
+                if stack:
+                    caller = stack[-1][0]
+                    stack[-1][1] += elapsed
+                stats.add(elapsed, elapsed - frame[1], caller)
+
+        return wrapper
+
+    def snapshot(self):
+        return {name: (stats.calls, stats.total_time, stats.own_time)
+                for name, stats in self.stats.items()}
+
+    def to_json(self):
+        functions = sorted(self.stats.values(),
+                           key=lambda stats: stats.total_time, reverse=True)
+        return [{'function': stats.name,
+                 'file': stats.key[0],
+                 'line': stats.key[1],
+                 'calls': stats.calls,
+                 'total_time': stats.total_time,
+                 'own_time': stats.own_time}
+                for stats in functions]
+
+    def to_pstats(self):
+        return {stats.key: (stats.calls, stats.calls, stats.own_time,
+                            stats.total_time,
+                            {key: (calls, calls, own_time, total_time)
+                             for key, (calls, own_time, total_time)
+                             in stats.callers.items()})
+                for stats in self.stats.values()}
+
+    def dump(self, path):
+        if path.endswith('.json'):
+            with open(path, 'w') as file:
+                json.dump(self.to_json(), file, indent=2)
+        else:
+            with open(path, 'wb') as file:
+                marshal.dump(self.to_pstats(), file)
@@ -0,0 +1,237 @@
+from model.action import Action
+from model.colors_modes import ColorsModes
+from model.field import Field, WALL_PATTERNS
+from model.figure_generator import FigureGenerator, STRATEGIES
+from model.game_engine import GameEngine
+from model.logic_model import LogicModel
+
+MAGIC = b'TRP\x02'
+MAGIC_V1 = b'TRP\x01'
+
+ACTIONS_COUNT = len(Action)
+COLOR_MODE = ACTIONS_COUNT
+GAME_END = ACTIONS_COUNT + 1
+UNDO = ACTIONS_COUNT + 2
+CODE_BITS = 3
+MAX_FIELD_CELLS = 1 << 20
+
+_STRATEGIES_NAMES = sorted(STRATEGIES)
+_COLORS_MODES = list(ColorsModes)
+_WALLS_NAMES = sorted(WALL_PATTERNS)
+
+
+class ReplayError(Exception):
+    pass
+
+
+def write_varint(buffer, value):
+    while value > 0x7f:
+        buffer.append(value & 0x7f | 0x80)
+        value >>= 7
+    buffer.append(value)
+
+
+def read_varint(file):
+    value = 0
+    shift = 0
+    while True:
+        byte = file.read(1)
+        if not byte:
+            if shift:
+                raise ReplayError('Truncated replay')
+            return None
+        value |= (byte[0] & 0x7f) << shift
+        if byte[0] < 0x80:
+            return value
+        shift += 7
+
+
+def _strategy_name(generator):
+    for name, strategy in STRATEGIES.items():
+        if type(generator.strategy) is strategy:
+            return name
+    raise ReplayError('Unknown figure generator strategy')
+
+
+class ReplayRecorder:
+    def __init__(self, logic_model, color_mode=ColorsModes.ON):
+        field = logic_model.field
+        generator = logic_model.generator
+        self.data = bytearray(MAGIC)
+        for value in (generator.seed,
+                      _STRATEGIES_NAMES.index(_strategy_name(generator)),
+                      field.width, field.height, field.min_rectangle_area,
+                      _COLORS_MODES.index(color_mode),
+                      _WALLS_NAMES.index(field.walls), field.walls_seed):
+            write_varint(self.data, value)
+        self._ticks = 0
+
+    def _event(self, ticks, code, argument=None):
+        write_varint(self.data, (ticks - self._ticks) << CODE_BITS | code)
+        if argument is not None:
+            write_varint(self.data, argument)
+        self._ticks = ticks
+
+    def action(self, ticks, action):
+        self._event(ticks, action.value - 1)
+
+    def color_mode(self, ticks, color_mode):
+        self._event(ticks, COLOR_MODE, _COLORS_MODES.index(color_mode))
+
+    def undo(self, ticks):
+        self._event(ticks, UNDO)
+
+    def end(self, ticks, scores):
+        self._event(ticks, GAME_END, int(scores))
+        self._ticks = 0
+
+    def save(self, path):
+        with open(path, 'wb') as file:
+            file.write(self.data)
+
+
+class ReplayReader:
+    def __init__(self, file):
+        self.file = file
+        magic = file.read(len(MAGIC))
+        if magic not in (MAGIC, MAGIC_V1):
+            raise ReplayError('Not a replay file')
+        header = [read_varint(file) for _ in range(
+            8 if magic == MAGIC else 6)]
+        if None in header:
+            raise ReplayError('Truncated replay')
+        if magic == MAGIC_V1:
+            header += [_WALLS_NAMES.index('alternating'), 0]
+        (self.seed, strategy, self.width, self.height,
+         self.min_rectangle_area, color_mode, walls, self.walls_seed) = header
+        if (strategy >= len(_STRATEGIES_NAMES) or
+                color_mode >= len(_COLORS_MODES) or
+                walls >= len(_WALLS_NAMES) or
+                self.min_rectangle_area < 1 or
+                not 0 < self.width * self.height <= MAX_FIELD_CELLS):
+            raise ReplayError('Invalid replay header')
+        self.strategy = _STRATEGIES_NAMES[strategy]
+        self.color_mode = _COLORS_MODES[color_mode]
+        self.walls = _WALLS_NAMES[walls]
+
+    def create_logic_model(self, field_type=Field):
+        logic_model = LogicModel(
+            self.width, self.height, field_type,
+            FigureGenerator(self.seed, self.strategy),
+            self.min_rectangle_area, self.walls, self.walls_seed)
+        return logic_model
+
+    def events(self):
+        ticks = 0
+        while True:
+            value = read_varint(self.file)
+            if value is None:
+                return
+            ticks += value >> CODE_BITS
+            code = value & (1 << CODE_BITS) - 1
+            if code < ACTIONS_COUNT:
+                yield ticks, code, Action(code + 1)
+            elif code == COLOR_MODE:
+                color_mode = read_varint(self.file)
+                if color_mode is None or color_mode >= len(_COLORS_MODES):
+                    raise ReplayError('Invalid colour mode')
+                yield ticks, code, _COLORS_MODES[color_mode]
+            elif code == GAME_END:
+                scores = read_varint(self.file)
+                if scores is None:
+                    raise ReplayError('Truncated replay')
+                yield ticks, code, scores
+                ticks = 0
+            elif code == UNDO:
+                yield ticks, code, None
+            else:
+                raise ReplayError('Unknown event code {}'.format(code))
+
+
+class ReplayGame:
+    def __init__(self, index, claimed_scores, scores, level, claimed_ticks,
+                 ticks, figures_count):
+        self.index = index
+        self.claimed_scores = claimed_scores
+        self.scores = scores
+        self.level = level
+        self.claimed_ticks = claimed_ticks
+        self.ticks = ticks
+        self.figures_count = figures_count
+
+
+class ReplayPlayer:
+    def __init__(self, reader, field_type=Field):
+        self.reader = reader
+        self.logic_model = reader.create_logic_model(field_type)
+        self.engine = GameEngine(self.logic_model, reader.color_mode,
+                                 GameEngine.UNDO_DEPTH)
+        self.games_count = 0
+        self._events = reader.events()
+        self._pending = next(self._events, None)
+
+    @property
+    def finished(self):
+        return self._pending is None
+
+    def apply_due_events(self):
+        games = []
+        while self._pending is not None and (
+                self._pending[0] <= self.engine.ticks or
+                self.engine.game_over):
+            ticks, code, argument = self._pending
+            self._pending = next(self._events, None)
+            if code < ACTIONS_COUNT:
+                self.engine.apply(argument)
+            elif code == COLOR_MODE:
+                self.engine.set_color_mode(argument)
+            elif code == UNDO:
+                self.engine.undo()
+            else:
+                field = self.logic_model.field
+                games.append(ReplayGame(
+                    self.games_count, argument, int(field.scores),
+                    field.current_level, ticks, self.engine.ticks,
+                    self.logic_model.figures_count))
+                self.games_count += 1
+                if self._pending is not None:
+                    self.engine.restart()
+        return games
+
+    def games(self):
+        while True:
+            yield from self.apply_due_events()
+            if self.finished:
+                return
+            self.engine.tick()
+
+
+class Mismatch:
+    def __init__(self, path, game, claimed_scores, scores, claimed_ticks=None,
+                 ticks=None, error=None):
+        self.path = path
+        self.game = game
+        self.claimed_scores = claimed_scores
+        self.scores = scores
+        self.claimed_ticks = claimed_ticks
+        self.ticks = ticks
+        self.error = error
+
+
+def play_replay(path, field_type=Field):
+    with open(path, 'rb') as file:
+        return list(ReplayPlayer(ReplayReader(file), field_type).games())
+
+
+def verify_replay(path, field_type=Field):
+    try:
+        with open(path, 'rb') as file:
+            player = ReplayPlayer(ReplayReader(file), field_type)
+            for game in player.games():
+                if (game.claimed_scores != game.scores or
+                        game.claimed_ticks != game.ticks):
+                    yield Mismatch(path, game.index, game.claimed_scores,
+                                   game.scores, game.claimed_ticks,
+                                   game.ticks)
+    except (OSError, ReplayError) as error:
+        yield Mismatch(path, None, None, None, error=str(error))
@@ -0,0 +1,116 @@
+from functools import partial
+from model.action import Action
+from model.ai import PlacementAI
+from model.colors_modes import ColorsModes
+from model.figure_generator import FigureGenerator
+from model.game_engine import GameEngine
+from model.logic_model import LogicModel
+from model.replay import ReplayRecorder
+import random
+import statistics
+
+
+def drop_policy(logic_model, generator):
+    return [Action.DROP]
+
+
+def idle_policy(logic_model, generator):
+    return []
+
+
+def random_policy(logic_model, generator):
+    actions = [Action.ROTATE for _ in range(generator.randrange(4))]
+    shift = generator.randint(-logic_model.field.width // 2,
+                              logic_model.field.width // 2)
+    direction = Action.LEFT if shift < 0 else Action.RIGHT
+    actions.extend(direction for _ in range(abs(shift)))
+    actions.append(Action.DROP)
+    return actions
+
+
+def ai_policy(logic_model, generator, placement_ai=None):
+    if placement_ai is None:
+        placement_ai = PlacementAI()
+    return placement_ai.decide(logic_model)
+
+
+POLICIES = {
+    'ai': ai_policy,
+    'drop': drop_policy,
+    'idle': idle_policy,
+    'random': random_policy
+}
+
+
+class GameResult:
+    def __init__(self, seed, scores, level, ticks, figures_count,
+                 replay=None):
+        self.seed = seed
+        self.scores = scores
+        self.level = level
+        self.ticks = ticks
+        self.figures_count = figures_count
+        self.replay = replay
+
+
+def play_game(seed, policy='random', width=10, height=20,
+              min_rectangle_area=None, max_ticks=100000,
+              color_mode=ColorsModes.ON, strategy='never_repeat',
+              record=False, walls='alternating', walls_seed=0):
+    generator = random.Random(seed)
+    policy = POLICIES[policy]
+    if policy is ai_policy:
+        policy = partial(ai_policy, placement_ai=PlacementAI())
+
+    logic_model = LogicModel(width, height,
+                             generator=FigureGenerator(seed, strategy),
+                             min_rectangle_area=min_rectangle_area,
+                             walls=walls, walls_seed=walls_seed)
+    engine = GameEngine(logic_model, color_mode)
+    recorder = ReplayRecorder(logic_model, color_mode) if record else None
+
+    figures_count = 0
+    while engine.ticks < max_ticks:
+        if figures_count != logic_model.figures_count:
+            figures_count = logic_model.figures_count
+            for action in policy(logic_model, generator):
+                if recorder is not None:
+                    recorder.action(engine.ticks, action)
+                engine.apply(action)
+        if not engine.tick():
+            break
+
+    replay = None
+    if recorder is not None:
+        recorder.end(engine.ticks, logic_model.field.scores)
+        replay = bytes(recorder.data)
+    return GameResult(seed, logic_model.field.scores,
+                      logic_model.field.current_level, engine.ticks,
+                      logic_model.figures_count, replay)
+
+
+def distribution(values):
+    values = sorted(values)
+    return {
+        'min': values[0],
+        'mean': statistics.mean(values),
+        'median': statistics.median(values),
+        'p90': values[min(len(values) - 1, len(values) * 9 // 10)],
+        'max': values[-1]
+    }
+
+
+def summarize(results, elapsed_time):
+    summary = {
+        'games': len(results),
+        'seconds': elapsed_time,
+        'games_per_second': len(results) / elapsed_time,
+        'pieces_per_second':
+            sum(result.figures_count for result in results) / elapsed_time,
+        'ticks_per_second':
+            sum(result.ticks for result in results) / elapsed_time
+    }
+    for name in ('scores', 'level', 'ticks', 'figures_count'):
+        summary[name] = distribution(
+            [getattr(result, name) for result in results])
+    return summary
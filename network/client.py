@@ -0,0 +1,128 @@
+import asyncio
+import random
+
+from model import self_play
+from model.field import Field
+from network import protocol
+
+BOT_POLICIES = {name: self_play.POLICIES[name]
+                for name in ('drop', 'idle', 'random')}
+
+
+class GameClient:
+    def __init__(self, reader, writer):
+        self.reader = reader
+        self.writer = writer
+        self.session_id = None
+        self.field = None
+        self.seed = None
+        self.figure = None
+        self.color = None
+        self.next_figure = None
+        self.next_color = None
+        self.figures_count = 0
+        self.scores = 0
+        self.level = 1
+        self.game_over = False
+        self.messages_count = 0
+
+    @classmethod
+    async def connect(cls, host='127.0.0.1', port=7777):
+        reader, writer = await asyncio.open_connection(host, port)
+        client = cls(reader, writer)
+        writer.write(protocol.encode(protocol.HELLO, protocol.VERSION))
+        if await client.receive() != protocol.WELCOME:
+            writer.close()
+            raise protocol.ProtocolError('Connection was refused')
+        return client
+
+    def send_action(self, action):
+        self.writer.write(protocol.encode(protocol.ACTION, action.value))
+
+    def restart(self):
+        self.writer.write(protocol.encode(protocol.RESTART))
+
+    async def receive(self):
+        message = await protocol.read_message(
+            self.reader, protocol.MAX_SERVER_MESSAGE_SIZE)
+        if message is None:
+            return None
+        message_type, values = message
+        self.messages_count += 1
+
+        if message_type == protocol.WELCOME and len(values) == 5:
+            (self.session_id, width, height, min_rectangle_area,
+             self.seed) = values
+            self.field = Field(width, height,
+                               min_rectangle_area=min_rectangle_area,
+                               walls='none')
+        elif message_type in (protocol.BOARD, protocol.CELLS) and \
+                self.field is not None:
+            if message_type == protocol.BOARD:
+                self.field.matrix = [[None] * self.field.width
+                                     for _ in range(self.field.height)]
+            for row, column, item in protocol.decode_cells(
+                    values, self.field.width):
+                if not (0 <= row < self.field.height):
+                    raise protocol.ProtocolError('Cell is out of the field')
+                self.field.set_cell(row, column, item)
+        elif message_type == protocol.PIECE and len(values) == 4:
+            try:
+                self.figure = protocol.FIGURES[values[0]]
+                self.color = protocol.COLORS[values[1]]
+                self.next_figure = protocol.FIGURES[values[2]]
+                self.next_color = protocol.COLORS[values[3]]
+            except IndexError:
+                raise protocol.ProtocolError('Unknown figure or colour')
+            self.figures_count += 1
+        elif message_type == protocol.SCORES and len(values) == 2:
+            self.scores, self.level = values
+        elif message_type == protocol.GAME_OVER and len(values) == 1:
+            self.scores = values[0]
+            self.game_over = True
+        elif message_type == protocol.RESTARTED and not values:
+            self.game_over = False
+            self.figures_count = 0
+        else:
+            raise protocol.ProtocolError(
+                'Unexpected message {}'.format(message_type))
+        return message_type
+
+    def close(self):
+        self.writer.close()
+
+
+class BotResult:
+    def __init__(self, session_id, scores, figures_count, messages_count):
+        self.session_id = session_id
+        self.scores = scores
+        self.figures_count = figures_count
+        self.messages_count = messages_count
+
+
+async def run_bot(host='127.0.0.1', port=7777, policy='random', seed=0,
+                  games=1, on_game_over=None):
+    client = await GameClient.connect(host, port)
+    policy = BOT_POLICIES[policy]
+    generator = random.Random(seed)
+    scores = []
+    figures_count = 0
+    try:
+        while len(scores) < games:
+            message_type = await client.receive()
+            if message_type is None:
+                break
+            if message_type == protocol.PIECE:
+                for action in policy(client, generator):
+                    client.send_action(action)
+            elif message_type == protocol.GAME_OVER:
+                scores.append(client.scores)
+                figures_count += client.figures_count
+                if on_game_over is not None:
+                    on_game_over(client)
+                if len(scores) < games:
+                    client.restart()
+    finally:
+        client.close()
+    return BotResult(client.session_id, scores, figures_count,
+                     client.messages_count)
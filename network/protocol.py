@@ -0,0 +1,101 @@
+import io
+
+from model.array_field import CODES, ITEMS
+from model.color import Color
+from model.figure import Figure
+from model.replay import ReplayError, read_varint, write_varint
+
+VERSION = 1
+
+HELLO = 0
+ACTION = 1
+RESTART = 2
+
+WELCOME = 0
+BOARD = 1
+CELLS = 2
+PIECE = 3
+SCORES = 4
+GAME_OVER = 5
+RESTARTED = 6
+
+ITEM_BITS = 3
+MAX_CLIENT_MESSAGE_SIZE = 64
+MAX_SERVER_MESSAGE_SIZE = 1 << 22
+MAX_LENGTH_SHIFT = 28
+
+FIGURES = list(Figure)
+FIGURES_CODES = {figure: code for code, figure in enumerate(FIGURES)}
+COLORS = list(Color)
+COLORS_CODES = {color: code for code, color in enumerate(COLORS)}
+
+
+class ProtocolError(Exception):
+    pass
+
+
+def encode(message_type, *values):
+    payload = bytearray([message_type])
+    for value in values:
+        write_varint(payload, value)
+    message = bytearray()
+    write_varint(message, len(payload))
+    return bytes(message + payload)
+
+
+def encode_cells(message_type, field, cells):
+    indexes = sorted(row * field.width + column for row, column in cells)
+    values = []
+    previous_index = 0
+    for index in indexes:
+        item = field.get_cell(index // field.width, index % field.width)
+        if message_type == BOARD and item is None:
+            continue
+        values.append((index - previous_index) << ITEM_BITS | CODES[item])
+        previous_index = index
+    return encode(message_type, *values)
+
+
+def decode_cells(values, width):
+    index = 0
+    for value in values:
+        index += value >> ITEM_BITS
+        code = value & (1 << ITEM_BITS) - 1
+        if code >= len(ITEMS):
+            raise ProtocolError('Unknown cell item {}'.format(code))
+        yield index // width, index % width, ITEMS[code]
+
+
+def decode_values(payload):
+    file = io.BytesIO(payload)
+    values = []
+    try:
+        value = read_varint(file)
+        while value is not None:
+            values.append(value)
+            value = read_varint(file)
+    except ReplayError:
+        raise ProtocolError('Truncated message')
+    return values
+
+
+async def read_message(reader, max_size):
+    length = 0
+    shift = 0
+    while True:
+        byte = await reader.read(1)
+        if not byte:
+            if shift:
+                raise ProtocolError('Truncated message')
+            return None
+        length |= (byte[0] & 0x7f) << shift
+        if byte[0] < 0x80:
+            break
+        shift += 7
+        if shift > MAX_LENGTH_SHIFT:
+            raise ProtocolError('Message length is too long')
+
+    if not 0 < length <= max_size:
+        raise ProtocolError('Invalid message length {}'.format(length))
+    payload = await reader.readexactly(length)
+    return payload[0], decode_values(payload[1:])
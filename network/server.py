@@ -0,0 +1,207 @@
+import asyncio
+import itertools
+
+from model.action import Action
+from model.events import (
+    CellsChanged, GameOver, GameRestarted, LevelChanged, PieceSpawned,
+    ScoresChanged)
+from model.figure_generator import FigureGenerator
+from model.game_engine import GameEngine
+from model.logic_model import LogicModel
+from network import protocol
+
+
+class Session:
+    MAX_LAG = 0.25
+    MAX_WRITE_BUFFER = 1 << 20
+
+    def __init__(self, server, session_id, writer, logic_model):
+        self.server = server
+        self.id = session_id
+        self.writer = writer
+        self.logic_model = logic_model
+        self.engine = GameEngine(logic_model)
+        self.closed = False
+        self._events = []
+        self._deadline = None
+        self._handle = None
+        logic_model.events.add_listener(self._events.extend)
+
+    @property
+    def tick_interval(self):
+        return self.engine.tick_time / 1000 / self.server.speed
+
+    def start(self):
+        model = self.logic_model
+        self.send(protocol.encode(
+            protocol.WELCOME, self.id, model.field.width, model.field.height,
+            model.field.min_rectangle_area, model.generator.seed))
+        model.events.flush()
+        self._events.append(PieceSpawned(
+            model.current_figure, model.current_color, model.next_figure,
+            model.next_color))
+        self.send_events()
+        self._schedule(self.server.loop.time())
+
+    def _schedule(self, now):
+        self._deadline = now + self.tick_interval
+        self._handle = self.server.loop.call_at(self._deadline, self._tick)
+
+    def _tick(self):
+        self._handle = None
+        self.server.ticks += 1
+        running = self.engine.tick()
+        self.send_events()
+        if running and not self.closed:
+            now = self.server.loop.time()
+            self._deadline = max(self._deadline + self.tick_interval,
+                                 now - self.MAX_LAG)
+            self._handle = self.server.loop.call_at(self._deadline,
+                                                    self._tick)
+
+    def handle(self, message_type, values):
+        if message_type == protocol.ACTION and len(values) == 1:
+            try:
+                action = Action(values[0])
+            except ValueError:
+                raise protocol.ProtocolError(
+                    'Unknown action {}'.format(values[0]))
+            self.engine.apply(action)
+        elif message_type == protocol.RESTART and not values:
+            if self._handle is not None:
+                self._handle.cancel()
+            self.engine.restart()
+            self._schedule(self.server.loop.time())
+        else:
+            raise protocol.ProtocolError(
+                'Unexpected message {}'.format(message_type))
+        self.send_events()
+
+    def send_events(self):
+        field = self.logic_model.field
+        data = bytearray()
+        scores_changed = False
+        for event in self._events:
+            if isinstance(event, CellsChanged):
+                message_type = (
+                    protocol.BOARD
+                    if len(event.cells) >= field.width * field.height
+                    else protocol.CELLS)
+                data += protocol.encode_cells(message_type, field,
+                                              event.cells)
+            elif isinstance(event, PieceSpawned):
+                data += protocol.encode(
+                    protocol.PIECE, protocol.FIGURES_CODES[event.figure],
+                    protocol.COLORS_CODES[event.color],
+                    protocol.FIGURES_CODES[event.next_figure],
+                    protocol.COLORS_CODES[event.next_color])
+            elif isinstance(event, (ScoresChanged, LevelChanged)):
+                scores_changed = True
+            elif isinstance(event, GameOver):
+                data += protocol.encode(protocol.GAME_OVER,
+                                        int(event.scores))
+            elif isinstance(event, GameRestarted):
+                data += protocol.encode(protocol.RESTARTED)
+                scores_changed = True
+        self._events.clear()
+
+        if scores_changed:
+            data += protocol.encode(protocol.SCORES, int(field.scores),
+                                    field.current_level)
+        if data:
+            self.send(data)
+
+    def send(self, data):
+        if self.closed:
+            return
+        if (self.writer.transport.get_write_buffer_size() >
+                self.MAX_WRITE_BUFFER):
+            self.close()
+            return
+        self.writer.write(data)
+        self.server.bytes_sent += len(data)
+
+    def close(self):
+        if self.closed:
+            return
+        self.closed = True
+        if self._handle is not None:
+            self._handle.cancel()
+            self._handle = None
+        self.writer.close()
+
+
+class GameServer:
+    HELLO_TIMEOUT = 10.0
+
+    def __init__(self, width=10, height=20, min_rectangle_area=None,
+                 walls='alternating', walls_seed=0, seed=None, speed=1.0,
+                 max_sessions=1000):
+        self.width = width
+        self.height = height
+        self.min_rectangle_area = min_rectangle_area
+        self.walls = walls
+        self.walls_seed = walls_seed
+        self.seed = seed
+        self.speed = speed
+        self.max_sessions = max_sessions
+        self.sessions = {}
+        self.ticks = 0
+        self.bytes_sent = 0
+        self.loop = None
+        self._server = None
+        self._connections = {}
+        self._ids = itertools.count()
+
+    async def start(self, host='127.0.0.1', port=0):
+        self.loop = asyncio.get_running_loop()
+        self._server = await asyncio.start_server(self._serve_client, host,
+                                                  port)
+        return self._server.sockets[0].getsockname()[1]
+
+    async def close(self):
+        self._server.close()
+        await self._server.wait_closed()
+        for session in list(self.sessions.values()):
+            session.close()
+        for writer in self._connections.values():
+            writer.close()
+        if self._connections:
+            await asyncio.wait(list(self._connections))
+
+    def create_logic_model(self):
+        return LogicModel(self.width, self.height,
+                          generator=FigureGenerator(self.seed),
+                          min_rectangle_area=self.min_rectangle_area,
+                          walls=self.walls, walls_seed=self.walls_seed)
+
+    async def _serve_client(self, reader, writer):
+        task = asyncio.current_task()
+        self._connections[task] = writer
+        session = None
+        try:
+            message = await asyncio.wait_for(protocol.read_message(
+                reader, protocol.MAX_CLIENT_MESSAGE_SIZE), self.HELLO_TIMEOUT)
+            if message != (protocol.HELLO, [protocol.VERSION]) or \
+                    len(self.sessions) >= self.max_sessions:
+                return
+
+            session = Session(self, next(self._ids), writer,
+                              self.create_logic_model())
+            self.sessions[session.id] = session
+            session.start()
+            while not session.closed:
+                message = await protocol.read_message(
+                    reader, protocol.MAX_CLIENT_MESSAGE_SIZE)
+                if message is None:
+                    break
+                session.handle(*message)
+        except (protocol.ProtocolError, asyncio.IncompleteReadError,
+                asyncio.TimeoutError, ConnectionError):
+            pass
+        finally:
+            if session is not None:
+                session.close()
+                del self.sessions[session.id]
+            writer.close()
+            del self._connections[task]
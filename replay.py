@@ -0,0 +1,30 @@
+import argparse
+import time
+
+from model import replay
+
+
+def parse_arguments():
+    parser = argparse.ArgumentParser(
+        description='Play recorded Tetris replays headlessly at maximum '
+                    'speed.')
+    parser.add_argument('replays', nargs='+', metavar='REPLAY')
+    return parser.parse_args()
+
+
+def main():
+    arguments = parse_arguments()
+    for replay_path in arguments.replays:
+        start_time = time.perf_counter()
+        games = replay.play_replay(replay_path)
+        elapsed_time = time.perf_counter() - start_time
+        print('{}: {} games, {:.3f} s'.format(replay_path, len(games),
+                                              elapsed_time))
+        for game in games:
+            print('  game {index}: scores {scores} (claimed '
+                  '{claimed_scores}), level {level}, ticks {ticks}, '
+                  'figures {figures_count}'.format(**vars(game)))
+
+
+if __name__ == '__main__':
+    main()
@@ -0,0 +1,70 @@
+import argparse
+import asyncio
+import time
+
+from model import field
+from network.server import GameServer
+
+
+def parse_arguments():
+    parser = argparse.ArgumentParser(
+        description='Host Tetris games for network players, one game per '
+                    'connection.')
+    parser.add_argument('--host', default='0.0.0.0')
+    parser.add_argument('--port', type=int, default=7777)
+    parser.add_argument('--width', type=int, default=10)
+    parser.add_argument('--height', type=int, default=20)
+    parser.add_argument('--walls', default='alternating',
+                        choices=sorted(field.WALL_PATTERNS),
+                        help='wall layout of the field')
+    parser.add_argument('--walls-seed', type=int, default=0,
+                        help='seed of the random wall layout')
+    parser.add_argument('--min-area', type=int, default=None,
+                        help='minimum area of a removed rectangle '
+                             '(default: field width - 1)')
+    parser.add_argument('--seed', type=int, default=None,
+                        help='figure sequence seed shared by all players '
+                             '(default: a random seed per game)')
+    parser.add_argument('--speed', type=float, default=1.0,
+                        help='tick rate multiplier')
+    parser.add_argument('--max-sessions', type=int, default=1000)
+    parser.add_argument('--stats', type=float, default=10.0,
+                        metavar='SECONDS',
+                        help='interval of the load report, 0 disables it')
+    arguments = parser.parse_args()
+    if arguments.min_area is not None and arguments.min_area < 1:
+        parser.error('--min-area must be a positive number')
+    return arguments
+
+
+async def serve(arguments):
+    server = GameServer(arguments.width, arguments.height,
+                        arguments.min_area, arguments.walls,
+                        arguments.walls_seed, arguments.seed,
+                        arguments.speed, arguments.max_sessions)
+    port = await server.start(arguments.host, arguments.port)
+    print('listening on {}:{}'.format(arguments.host, port))
+    try:
+        while True:
+            ticks, bytes_sent = server.ticks, server.bytes_sent
+            start_time = time.perf_counter()
+            await asyncio.sleep(arguments.stats or 3600)
+            elapsed_time = time.perf_counter() - start_time
+            if arguments.stats:
+                print('sessions: {}, {:.0f} ticks/s, {:.1f} KB/s'.format(
+                    len(server.sessions),
+                    (server.ticks - ticks) / elapsed_time,
+                    (server.bytes_sent - bytes_sent) / 1024 / elapsed_time))
+    finally:
+        await server.close()
+
+
+def main():
+    try:
+        asyncio.run(serve(parse_arguments()))
+    except KeyboardInterrupt:
+        pass
+
+
+if __name__ == '__main__':
+    main()
@@ -0,0 +1,102 @@
+from concurrent.futures import ProcessPoolExecutor
+from functools import partial
+import argparse
+import json
+import os
+import time
+
+from model import field, figure_generator, profiler, self_play
+
+
+def parse_arguments():
+    parser = argparse.ArgumentParser(
+        description='Play Tetris games headlessly in parallel and report '
+                    'throughput and result distributions.')
+    parser.add_argument('-n', '--games', type=int, default=100)
+    parser.add_argument('-w', '--workers', type=int, default=os.cpu_count())
+    parser.add_argument('-s', '--seed', type=int, default=0,
+                        help='seed of the first game, game i uses seed + i')
+    parser.add_argument('-p', '--policy', default='random',
+                        choices=sorted(self_play.POLICIES))
+    parser.add_argument('--strategy', default='never_repeat',
+                        choices=sorted(figure_generator.STRATEGIES),
+                        help='figure sequence strategy')
+    parser.add_argument('--width', type=int, default=10)
+    parser.add_argument('--height', type=int, default=20)
+    parser.add_argument('--min-area', type=int, default=None,
+                        help='minimum area of a removed rectangle '
+                             '(default: field width - 1)')
+    parser.add_argument('--walls', default='alternating',
+                        choices=sorted(field.WALL_PATTERNS),
+                        help='wall layout of the field')
+    parser.add_argument('--walls-seed', type=int, default=0,
+                        help='seed of the random wall layout')
+    parser.add_argument('--max-ticks', type=int, default=100000)
+    parser.add_argument('--json', action='store_true',
+                        help='print the summary as JSON')
+    parser.add_argument('--record', metavar='DIRECTORY',
+                        help='save a replay of every game into DIRECTORY')
+    parser.add_argument('--profile', metavar='FILE',
+                        help='play the games in this process with the hot '
+                             'paths instrumented and write their statistics '
+                             'into FILE (JSON if it ends with .json, '
+                             'otherwise a pstats file)')
+    arguments = parser.parse_args()
+    if arguments.min_area is not None and arguments.min_area < 1:
+        parser.error('--min-area must be a positive number')
+    return arguments
+
+
+def print_summary(summary):
+    print('games: {games}, {seconds:.2f} s, {games_per_second:.1f} games/s, '
+          '{pieces_per_second:.0f} pieces/s, '
+          '{ticks_per_second:.0f} ticks/s'.format(**summary))
+    for name in ('scores', 'level', 'ticks', 'figures_count'):
+        print('{:>14}: min {min}, mean {mean:.1f}, median {median}, '
+              'p90 {p90}, max {max}'.format(name, **summary[name]))
+
+
+def main():
+    arguments = parse_arguments()
+    play_game = partial(self_play.play_game, policy=arguments.policy,
+                        width=arguments.width, height=arguments.height,
+                        min_rectangle_area=arguments.min_area,
+                        max_ticks=arguments.max_ticks,
+                        strategy=arguments.strategy,
+                        record=arguments.record is not None,
+                        walls=arguments.walls,
+                        walls_seed=arguments.walls_seed)
+    seeds = range(arguments.seed, arguments.seed + arguments.games)
+    chunk_size = max(1, arguments.games // (4 * arguments.workers))
+
+    start_time = time.perf_counter()
+    if arguments.profile is not None:
+        game_profiler = profiler.Profiler()
+        game_profiler.enable()
+        try:
+            results = list(map(play_game, seeds))
+        finally:
+            game_profiler.disable()
+        game_profiler.dump(arguments.profile)
+    else:
+        with ProcessPoolExecutor(arguments.workers) as executor:
+            results = list(executor.map(play_game, seeds,
+                                        chunksize=chunk_size))
+    summary = self_play.summarize(results, time.perf_counter() - start_time)
+
+    if arguments.record is not None:
+        os.makedirs(arguments.record, exist_ok=True)
+        for result in results:
+            replay_path = os.path.join(arguments.record,
+                                       '{}.trp'.format(result.seed))
+            with open(replay_path, 'wb') as file:
+                file.write(result.replay)
+
+    if arguments.json:
+        print(json.dumps(summary, indent=2))
+    else:
+        print_summary(summary)
+
+
+if __name__ == '__main__':
+    main()
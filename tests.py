@@ -1,12 +1,29 @@
+import asyncio
+import io
+import json
+import os
+import pstats
+import random
+import tempfile
 import unittest
-from model import logic_model, direction, position, figure
-from model import falling_figure
+try:
+    from model import batch_field
+except ImportError:
+    batch_field = None
+from model import logic_model, direction, position, figure, field
+from model import falling_figure, array_field, game_engine, self_play
+from model import figure_generator, ai, replay, events, game_loop
+from model import profiler
+from network import client, protocol, server
+from model.action import Action
+from model.colors_modes import ColorsModes
 from model.color import Color
 from model.wall import Wall
 
 
 class Tests(unittest.TestCase):
     LogicModel = None
+    FIELD_TYPE = field.Field
 
     ITEM_TO_SYMBOL = {
         None: '.',
@@ -51,7 +68,7 @@ class Tests(unittest.TestCase):
         self.LogicModel.falling_figure.color = Color.RED
 
     def setUp(self):
-        self.LogicModel = logic_model.LogicModel(10, 10)
+        self.LogicModel = logic_model.LogicModel(10, 10, self.FIELD_TYPE)
 
     def test_remove_horizontal_line(self):
         entered_ = ("x....1....\n"
@@ -461,6 +478,1212 @@ class Tests(unittest.TestCase):
         self.make_action_and_compare_results(
             entered_, expected, self.LogicModel.falling_figure.try_rotate_left)
 
+    def test_histogram_search_matches_reference(self):
+        generator = random.Random(2017)
+        items = [None, Wall.WALL] + list(Color)
+        for width, height in ((1, 1), (3, 7), (10, 10), (12, 30)):
+            board = self.FIELD_TYPE(width, height)
+            for _ in range(50):
+                dominant = generator.choice(list(Color))
+                board.matrix = [
+                    [dominant if generator.random() < 0.6 else
+                     generator.choice(items) for _ in range(width)]
+                    for _ in range(height)]
+                rectangles = board._search_completed_rectangles(
+                    (0, 0, height - 1, width - 1))
+                for color in Color:
+                    expected = \
+                        board._search_completed_color_rectangle_reference(
+                            color)
+                    self.assertEqual(
+                        expected,
+                        board._search_completed_color_rectangle(color))
+                    self.assertEqual(expected, rectangles[color])
+
+    def test_dirty_region_search_matches_full_scan(self):
+        generator = random.Random(1117)
+        incremental = self.FIELD_TYPE(10, 30)
+        full = self.FIELD_TYPE(10, 30, full_scan=True)
+        for _ in range(2000):
+            color = generator.choice([Color.RED] * 4 + list(Color))
+            row = generator.randrange(30)
+            column = generator.randrange(10)
+            cells = [position.Position(row + delta_row, column + delta_column)
+                     for delta_row in range(2) for delta_column in range(2)]
+            cells = [cell for cell in cells
+                     if cell.row < 30 and cell.column < 10 and
+                     full.is_free(cell.row, cell.column)]
+            for board in (incremental, full):
+                for cell in cells:
+                    board.set_cell(cell.row, cell.column, color)
+            incremental.mark_positions_dirty(cells)
+
+            incremental.remove_completed_rectangle()
+            full.remove_completed_rectangle()
+            self.assertEqual(self.matrix_to_string(full.matrix),
+                             self.matrix_to_string(incremental.matrix))
+            self.assertEqual(full.scores, incremental.scores)
+        self.assertGreater(full.destroyed_rectangles_count, 5)
+
+    def test_block_shift_matches_cell_by_cell_shift(self):
+        generator = random.Random(23)
+        for _ in range(300):
+            board = self.FIELD_TYPE(8, 12)
+            for _ in range(80):
+                row = generator.randrange(12)
+                column = generator.randrange(8)
+                if not board.is_wall(row, column):
+                    board.set_cell(row, column,
+                                   generator.choice([None, *Color]))
+            top = generator.randrange(12)
+            bottom = generator.randrange(top, 12)
+            left = generator.randrange(8)
+            right = generator.randrange(left, 8)
+            for row in range(top, bottom + 1):
+                for column in range(left, right + 1):
+                    board.set_cell(row, column, None)
+
+            expected = [list(items) for items in board.matrix]
+            height = bottom - top + 1
+            for row in range(top - 1, -1, -1):
+                for column in range(left, right + 1):
+                    if expected[row][column] is not Wall.WALL:
+                        expected[row + height][column] = \
+                            expected[row][column]
+                        expected[row][column] = None
+
+            board._move_down_after_remove_rectangle(
+                ((bottom - top + 1) * (right - left + 1),
+                 position.Position(top, left),
+                 position.Position(bottom, right)), None)
+            self.assertEqual(self.matrix_to_string(expected),
+                             self.matrix_to_string(board.matrix))
+            board_hash = board.hash
+            board._rebuild_indexes()
+            self.assertEqual(board_hash, board.hash)
+
+    def test_rotation_tables(self):
+        expected_rotations_count = {
+            figure.Figure.I_FIGURE: 2, figure.Figure.J_FIGURE: 4,
+            figure.Figure.L_FIGURE: 4, figure.Figure.O_FIGURE: 1,
+            figure.Figure.S_FIGURE: 2, figure.Figure.T_FIGURE: 4,
+            figure.Figure.N_FIGURE: 2}
+        for _figure, (rotations, _) in \
+                falling_figure.FIGURES_ROTATIONS.items():
+            self.assertEqual(expected_rotations_count[_figure],
+                             len(rotations))
+            for rotation in rotations:
+                self.assertEqual(0, min(row for row, _ in rotation))
+                self.assertEqual(0, min(column for _, column in rotation))
+
+    def test_move_custom_figure(self):
+        entered_ = ("x...1.....\n"
+                    "...111...x\n"
+                    "x...1.....\n"
+                    ".........x\n"
+                    "x.........\n"
+                    ".........x\n"
+                    "x.........\n"
+                    ".........x\n"
+                    "x...2.....\n"
+                    ".........x")
+        expected = ("x.........\n"
+                    ".........x\n"
+                    "x.........\n"
+                    ".........x\n"
+                    "x.........\n"
+                    "....1....x\n"
+                    "x..111....\n"
+                    "....1....x\n"
+                    "x...2.....\n"
+                    ".........x")
+        self.LogicModel.falling_figure.positions_list = [
+            position.Position(row, column)
+            for row, column in ((0, 4), (1, 3), (1, 4), (1, 5), (2, 4))]
+        self.LogicModel.falling_figure.color = Color.RED
+        self.make_action_and_compare_results(
+            entered_, expected,
+            self.LogicModel.falling_figure.drop_figure)
+
+    def test_ghost_positions(self):
+        entered_ = ("x...1.....\n"
+                    "....1....x\n"
+                    "x...1.....\n"
+                    "....1....x\n"
+                    "x.........\n"
+                    ".........x\n"
+                    "x.........\n"
+                    ".........x\n"
+                    "x...2.....\n"
+                    ".........x")
+        self.LogicModel.field.matrix = self.string_to_matrix(entered_)
+        self.create_and_shift_figure()
+        ghost = self.LogicModel.falling_figure.ghost_positions()
+        self.assertEqual([(7, 4), (6, 4), (5, 4), (4, 4)],
+                         [(cell.row, cell.column) for cell in ghost])
+        self.assertEqual(
+            entered_, self.matrix_to_string(self.LogicModel.field.matrix))
+
+    def test_drop_distance_matches_step_by_step_drop(self):
+        generator = random.Random(7)
+        for _ in range(200):
+            self.setUp()
+            board = self.LogicModel.field
+            for row in range(board.height):
+                for column in range(board.width):
+                    if (not board.is_wall(row, column) and
+                            generator.random() < row / 20):
+                        board.set_cell(row, column,
+                                       generator.choice(list(Color)))
+            figure_ = self.LogicModel.falling_figure
+            figure_.remove_figure_from_field()
+            figure_.row = generator.randrange(-4, 6)
+            figure_.column = generator.randrange(0, 7)
+            if not figure_._check_position(figure_.row, figure_.column,
+                                           figure_.shape):
+                continue
+            figure_.display_figure_on_field()
+
+            distance = figure_.drop_distance()
+            steps = 0
+            while figure_.check_move(direction.Direction.DOWN):
+                figure_.try_move(direction.Direction.DOWN)
+                steps += 1
+            self.assertEqual(steps, distance)
+
+    def test_changed_cells_tracking(self):
+        board = self.FIELD_TYPE(10, 10)
+        board.set_cell(5, 5, Color.RED)
+        self.assertIsNone(board.pop_changed_cells())
+        board.set_cell(5, 6, Color.RED)
+        self.assertIsNone(board.pop_changed_cells())
+
+        board.track_changes()
+        self.assertEqual(100, len(board.pop_changed_cells()))
+        board.set_cell(5, 5, Color.RED)
+        board.set_cell(5, 6, Color.GREEN)
+        board.set_cell(6, 6, None)
+        self.assertEqual({(5, 6)}, board.pop_changed_cells())
+        self.assertEqual(set(), board.pop_changed_cells())
+        board.clear_field()
+        self.assertEqual(100, len(board.pop_changed_cells()))
+
+    def test_wall_patterns(self):
+        for walls in sorted(field.WALL_PATTERNS):
+            board = self.FIELD_TYPE(6, 40, walls=walls, walls_seed=3)
+            wall_cells = {(row, column) for row in range(40)
+                          for column in range(6)
+                          if board.is_wall(row, column)}
+            self.assertEqual(
+                set(field.WALL_PATTERNS[walls](6, 40, random.Random(3))),
+                wall_cells)
+            self.assertTrue(all(column in (0, 5)
+                                for _, column in wall_cells))
+            self.assertEqual(board.matrix, board.copy().matrix)
+
+            board.set_cell(39, 2, Color.RED)
+            board.clear_field()
+            self.assertEqual(
+                self.FIELD_TYPE(6, 40, walls=walls, walls_seed=3).matrix,
+                board.matrix)
+
+        self.assertNotEqual(
+            self.FIELD_TYPE(6, 40, walls='random', walls_seed=1).matrix,
+            self.FIELD_TYPE(6, 40, walls='random', walls_seed=2).matrix)
+        self.assertEqual(0, self.FIELD_TYPE(6, 40, walls='none').hash)
+
+    def test_min_rectangle_area_must_be_positive(self):
+        for min_rectangle_area in (0, -1):
+            with self.assertRaises(ValueError):
+                self.FIELD_TYPE(6, 6, min_rectangle_area=min_rectangle_area)
+        self.assertEqual(1, self.FIELD_TYPE(1, 6).min_rectangle_area)
+
+    def test_block_shift_on_tall_field(self):
+        generator = random.Random(5)
+        for seed in range(10):
+            board = self.FIELD_TYPE(6, 300, walls='random', walls_seed=seed)
+            stack_top = generator.randrange(300)
+            for row in range(stack_top, 300):
+                for column in range(6):
+                    if (not board.is_wall(row, column) and
+                            generator.random() < 0.5):
+                        board.set_cell(row, column, generator.choice(
+                            list(Color)))
+            top = generator.randrange(stack_top, 300)
+            bottom = generator.randrange(top, 300)
+            left = generator.randrange(6)
+            right = generator.randrange(left, 6)
+            for row in range(top, bottom + 1):
+                for column in range(left, right + 1):
+                    board.set_cell(row, column, None)
+
+            expected = [list(items) for items in board.matrix]
+            height = bottom - top + 1
+            for row in range(top - 1, -1, -1):
+                for column in range(left, right + 1):
+                    if expected[row][column] is not Wall.WALL:
+                        expected[row + height][column] = \
+                            expected[row][column]
+                        expected[row][column] = None
+
+            board._move_down_after_remove_rectangle(
+                ((bottom - top + 1) * (right - left + 1),
+                 position.Position(top, left),
+                 position.Position(bottom, right)), None)
+            self.assertEqual(self.matrix_to_string(expected),
+                             self.matrix_to_string(board.matrix))
+            board_hash = board.hash
+            board._rebuild_indexes()
+            self.assertEqual(board_hash, board.hash)
+
+
+class ArrayFieldTests(Tests):
+    FIELD_TYPE = array_field.ArrayField
+
+    def test_array_field_matches_list_field(self):
+        list_field = field.Field(10, 10)
+        self.assertEqual(list_field.matrix, self.LogicModel.field.matrix)
+
+        self.LogicModel.field.set_cell(3, 4, Color.GREEN)
+        self.assertIs(Color.GREEN, self.LogicModel.field.get_cell(3, 4))
+        self.assertFalse(self.LogicModel.field.is_free(3, 4))
+        self.assertTrue(self.LogicModel.field.is_wall(3, 9))
+
+        matrix = self.LogicModel.field.matrix
+        with self.assertRaises(TypeError):
+            matrix[3][4] = Color.RED
+        with self.assertRaises(TypeError):
+            matrix[3] = [None] * 10
+        self.assertIs(Color.GREEN, self.LogicModel.field.get_cell(3, 4))
+
+        row = matrix[3]
+        self.LogicModel.field.set_cell(3, 5, Color.RED)
+        self.assertIs(Color.RED, row[5])
+        self.assertIs(Color.RED, matrix[3][-5])
+        self.assertEqual(self.LogicModel.field.get_cell(3, 4), row[4])
+
+
+class FieldIndexesTests(unittest.TestCase):
+    def test_indexes_follow_writes_and_shifts(self):
+        model = logic_model.LogicModel(
+            generator=figure_generator.FigureGenerator(4))
+        model.field.min_rectangle_area = 4
+        engine = game_engine.GameEngine(model)
+        generator = random.Random(4)
+        board = model.field
+        while not engine.game_over:
+            for action in self_play.random_policy(model, generator):
+                engine.apply(action)
+            engine.tick()
+
+            indexes = (board.hash, list(board._column_masks),
+                       list(board._row_counts), list(board._color_counts))
+            board._rebuild_indexes()
+            self.assertEqual(indexes, (board.hash, board._column_masks,
+                                       board._row_counts,
+                                       board._color_counts))
+        self.assertGreater(board.destroyed_rectangles_count, 0)
+
+        for row in range(board.height):
+            self.assertEqual(
+                sum(board.get_cell(row, column) in list(Color)
+                    for column in range(board.width)),
+                board.row_count(row))
+        for color in Color:
+            self.assertEqual(
+                sum(board.get_cell(row, column) is color
+                    for row in range(board.height)
+                    for column in range(board.width)),
+                board.color_count(color))
+
+    def test_column_height(self):
+        board = field.Field(5, 6)
+        self.assertEqual([0] * 5, [board.column_height(column)
+                                   for column in range(5)])
+        board.set_cell(5, 1, Color.RED)
+        board.set_cell(2, 1, Color.BLUE)
+        board.set_cell(4, 3, Color.GREEN)
+        self.assertEqual([0, 4, 0, 2, 0], [board.column_height(column)
+                                           for column in range(5)])
+
+    def test_rare_colors_are_not_searched(self):
+        board = field.Field(6, 6, full_scan=True, min_rectangle_area=4)
+        for row in range(1, 3):
+            for column in range(1, 4):
+                board.set_cell(row, column, Color.RED)
+        board.set_cell(4, 1, Color.BLUE)
+        self.assertEqual(6, board._search_max_area_rectangle()[0])
+
+        for row in range(1, 3):
+            board.set_cell(row, 1, Color.BLUE)
+        self.assertEqual(3, board.color_count(Color.BLUE))
+        self.assertEqual(4, board._search_max_area_rectangle()[0])
+        board.set_cell(1, 2, Color.GREEN)
+        self.assertIsNone(board._search_max_area_rectangle())
+
+
+class GameEngineTests(unittest.TestCase):
+    def setUp(self):
+        self.engine = game_engine.GameEngine(logic_model.LogicModel(10, 10))
+
+    def test_color_mode_mulct(self):
+        self.assertTrue(self.engine.set_color_mode(ColorsModes.GRAY))
+        self.engine.logic_model.field.scores = 100
+        self.engine.tick()
+        self.assertEqual(75, self.engine.logic_model.field.scores)
+        self.assertEqual(75, self.engine.current_scores)
+
+    def test_level_up_speeds_up_ticks(self):
+        self.engine.logic_model.field.current_level = 2
+        self.engine.tick()
+        self.assertEqual(2, self.engine.current_level)
+        self.assertAlmostEqual(425, self.engine.tick_time)
+
+    def test_run_until_end_of_the_game(self):
+        ticks = self.engine.run(((tick, Action.DROP) for tick in range(1000)),
+                                max_ticks=1000)
+        self.assertTrue(self.engine.game_over)
+        self.assertLess(ticks, 1000)
+        self.assertFalse(self.engine.tick())
+        self.assertGreater(self.engine.logic_model.figures_count, 1)
+
+        self.engine.restart()
+        self.assertFalse(self.engine.game_over)
+        self.assertEqual(1, self.engine.logic_model.figures_count)
+
+
+class EventsTests(unittest.TestCase):
+    def test_events_are_batched_per_engine_step(self):
+        model = logic_model.LogicModel(
+            generator=figure_generator.FigureGenerator(4))
+        model.field.min_rectangle_area = 4
+        engine = game_engine.GameEngine(model, ColorsModes.OFF)
+        model.events.emit(events.GameRestarted())
+
+        batches = []
+        model.events.add_listener(batches.append)
+        model.events.flush()
+        self.assertEqual(model.field.width * model.field.height,
+                         len(batches[0][0].cells))
+
+        shadow = [[None for _ in range(model.field.width)]
+                  for _ in range(model.field.height)]
+        steps = 0
+        while not engine.game_over:
+            engine.apply(Action.DROP if steps % 3 else Action.LEFT)
+            engine.tick()
+            steps += 2
+        self.assertLessEqual(len(batches), steps + 1)
+
+        received = [event for batch in batches for event in batch]
+        for event in received:
+            if isinstance(event, events.CellsChanged):
+                for row, column in event.cells:
+                    shadow[row][column] = model.field.get_cell(row, column)
+        self.assertEqual(model.field.matrix, shadow)
+
+        def of_type(event_type):
+            return [event for event in received
+                    if isinstance(event, event_type)]
+
+        self.assertNotIn(events.GameRestarted, map(type, received))
+        self.assertEqual(model.figures_count - 1,
+                         len(of_type(events.PieceSpawned)))
+        self.assertEqual(model.figures_count - 1,
+                         len(of_type(events.PieceLocked)))
+        removed = of_type(events.RectangleRemoved)
+        self.assertGreater(len(removed), 0)
+        self.assertEqual(model.field.destroyed_rectangles_count,
+                         len(removed))
+        self.assertTrue(all(event.area >= 4 for event in removed))
+        self.assertEqual(model.field.scores,
+                         of_type(events.ScoresChanged)[-1].scores)
+        self.assertIsInstance(received[-1], events.GameOver)
+
+    def test_events_are_not_queued_without_listeners(self):
+        model = logic_model.LogicModel()
+        engine = game_engine.GameEngine(model)
+        engine.apply(Action.DROP)
+        engine.tick()
+        self.assertEqual([], model.events._events)
+        self.assertIsNone(model.field.pop_changed_cells())
+
+        received = []
+        model.events.add_listener(received.extend)
+        engine.apply(Action.DROP)
+        model.events.remove_listener(received.extend)
+        engine.tick()
+        self.assertEqual([], model.events._events)
+        self.assertIsNone(model.field.pop_changed_cells())
+
+
+class GameLoopTests(unittest.TestCase):
+    def setUp(self):
+        self.engine = game_engine.GameEngine(logic_model.LogicModel(10, 10))
+        self.actions = []
+        self.loop = game_loop.GameLoop(
+            self.engine, lambda ticks, action: self.actions.append(action))
+
+    def test_ticks_follow_gravity_across_uneven_frames(self):
+        ticks = sum(self.loop.advance(elapsed)
+                    for elapsed in [16, 17, 17] * 100)
+        self.assertEqual(int(5000 // self.engine.tick_time), ticks)
+        self.assertEqual(ticks, self.engine.ticks)
+
+    def test_long_frames_are_clamped(self):
+        self.assertEqual(0, self.loop.advance(10000))
+        self.assertEqual(self.loop.MAX_FRAME_TIME, self.loop.time)
+
+    def test_held_key_repeats_after_delay(self):
+        self.loop.press(Action.LEFT)
+        self.loop.press(Action.ROTATE)
+        for _ in range(27):
+            self.loop.advance(10)
+        self.assertEqual([Action.LEFT, Action.ROTATE] + [Action.LEFT] * 3,
+                         self.actions)
+
+        self.loop.release(Action.LEFT)
+        self.loop.advance(200)
+        self.assertEqual(5, len(self.actions))
+
+    def test_before_tick_stops_the_loop(self):
+        loop = game_loop.GameLoop(self.engine, before_tick=lambda: False)
+        for _ in range(4):
+            self.assertEqual(0, loop.advance(200))
+        self.assertFalse(loop.running)
+        self.assertEqual(0, self.engine.ticks)
+
+    def test_input_is_ignored_after_game_over(self):
+        self.engine.game_over = True
+        self.loop.press(Action.DROP)
+        self.assertEqual([], self.actions)
+
+
+class ProfilerTests(unittest.TestCase):
+    def setUp(self):
+        self.profiler = profiler.Profiler()
+        self.addCleanup(self.profiler.disable)
+
+    def test_hot_paths_are_counted_only_while_enabled(self):
+        original = falling_figure.FallingFigure.__dict__['check_move']
+        self_play.play_game(3)
+        self.profiler.enable()
+        self.assertIsNot(original,
+                         falling_figure.FallingFigure.__dict__['check_move'])
+        self_play.play_game(3)
+        self.profiler.disable()
+        self.assertIs(original,
+                      falling_figure.FallingFigure.__dict__['check_move'])
+        calls = self.profiler.snapshot()
+        self_play.play_game(3)
+
+        self.assertEqual(calls, self.profiler.snapshot())
+        counts = {name: stats.calls
+                  for name, stats in self.profiler.stats.items()}
+        self.assertEqual(len(profiler.HOT_PATHS), len(counts))
+        self.assertGreater(counts['FallingFigure.check_move'], 0)
+        self.assertGreater(counts['FallingFigure._is_valid_position'],
+                           counts['FallingFigure.check_move'])
+
+        stats = self.profiler.stats['FallingFigure._is_valid_position']
+        caller_calls = sum(calls for calls, _, _ in stats.callers.values())
+        self.assertLessEqual(caller_calls, stats.calls)
+        self.assertIn(
+            self.profiler.stats['FallingFigure.check_move'].key, stats.callers)
+        for stats in self.profiler.stats.values():
+            self.assertLessEqual(stats.own_time, stats.total_time)
+
+    def test_dump_formats(self):
+        self.profiler.enable()
+        self_play.play_game(5)
+        self.profiler.disable()
+        with tempfile.TemporaryDirectory() as directory:
+            json_path = os.path.join(directory, 'profile.json')
+            stats_path = os.path.join(directory, 'profile.prof')
+            self.profiler.dump(json_path)
+            self.profiler.dump(stats_path)
+            with open(json_path) as file:
+                functions = json.load(file)
+            stats = pstats.Stats(stats_path)
+
+        self.assertEqual(sorted(self.profiler.stats),
+                         sorted(function['function']
+                                for function in functions))
+        self.assertEqual(sum(function['calls'] for function in functions),
+                         stats.total_calls)
+
+
+class SelfPlayTests(unittest.TestCase):
+    def test_games_are_reproducible(self):
+        for policy in self_play.POLICIES:
+            first = self_play.play_game(5, policy)
+            second = self_play.play_game(5, policy)
+            self.assertEqual(vars(first), vars(second))
+
+    def test_summarize(self):
+        results = [self_play.play_game(seed, 'drop', min_rectangle_area=4)
+                   for seed in range(10)]
+        summary = self_play.summarize(results, 2.0)
+        self.assertEqual(10, summary['games'])
+        self.assertEqual(5, summary['games_per_second'])
+        self.assertEqual(max(result.scores for result in results),
+                         summary['scores']['max'])
+        self.assertGreater(summary['scores']['max'], 0)
+
+
+class FigureGeneratorTests(unittest.TestCase):
+    def test_same_seed_same_sequence(self):
+        for strategy in figure_generator.STRATEGIES:
+            first = figure_generator.FigureGenerator(42, strategy)
+            second = figure_generator.FigureGenerator(42, strategy)
+            self.assertEqual(first.generate(100), second.generate(100))
+
+    def test_never_repeat_strategy(self):
+        generator = figure_generator.FigureGenerator(1)
+        figures = [_figure for _figure, _ in generator.generate(500)]
+        for previous, current in zip(figures, figures[1:]):
+            self.assertIsNot(previous, current)
+
+    def test_bag_strategy(self):
+        generator = figure_generator.FigureGenerator(1, 'bag')
+        figures = [_figure for _figure, _ in generator.generate(70)]
+        for start in range(0, 70, 7):
+            self.assertEqual(set(figure.Figure),
+                             set(figures[start:start + 7]))
+
+    def test_lookahead_queue(self):
+        generator = figure_generator.FigureGenerator(3)
+        lookahead = generator.peek(5)
+        self.assertEqual(lookahead, generator.peek(5))
+        self.assertEqual(lookahead[:2], generator.generate(2))
+        self.assertEqual(lookahead[2:], generator.peek(3))
+
+        model = logic_model.LogicModel(
+            generator=figure_generator.FigureGenerator(3))
+        self.assertEqual((model.current_figure, model.current_color),
+                         lookahead[0])
+        self.assertEqual((model.next_figure, model.next_color), lookahead[1])
+
+
+class PlacementAITests(unittest.TestCase):
+    @staticmethod
+    def _reachable_placements(falling_figure):
+        start = (falling_figure.rotation, falling_figure.row,
+                 falling_figure.column)
+        visited = {start}
+        stack = [start]
+        placements = set()
+        while stack:
+            rotation, row, column = stack.pop()
+            states = ((rotation, row, column - 1),
+                      (rotation, row, column + 1),
+                      (rotation, row + 1, column),
+                      ((rotation + 1) % len(falling_figure.rotations),
+                       row, column))
+            if not falling_figure._check_position(
+                    row + 1, column, falling_figure.rotations[rotation]):
+                placements.add((rotation, row, column))
+            for state in states:
+                if state not in visited and falling_figure._check_position(
+                        state[1], state[2],
+                        falling_figure.rotations[state[0]]):
+                    visited.add(state)
+                    stack.append(state)
+        return placements
+
+    def test_placements_match_exhaustive_search(self):
+        for seed in range(5):
+            model = logic_model.LogicModel(
+                generator=figure_generator.FigureGenerator(seed))
+            engine = game_engine.GameEngine(model)
+            generator = random.Random(seed)
+            for _ in range(15):
+                for action in self_play.random_policy(model, generator):
+                    engine.apply(action)
+                engine.tick()
+                if engine.game_over:
+                    break
+
+                falling = model.falling_figure
+                falling.remove_figure_from_field()
+                expected = self._reachable_placements(falling)
+                actual = ai.PlacementAI.placements(
+                    model.field, falling.rotations, falling.rotation,
+                    falling.row, falling.column)
+                falling.display_figure_on_field()
+                self.assertEqual(expected, {
+                    (placement.rotation, placement.row, placement.column)
+                    for placement in actual})
+
+    def test_decided_actions_reach_best_placement(self):
+        model = logic_model.LogicModel(
+            generator=figure_generator.FigureGenerator(7))
+        engine = game_engine.GameEngine(model)
+        placement_ai = ai.PlacementAI()
+        for _ in range(20):
+            placement = placement_ai.best_placement(model)
+            actions = placement_ai.decide(model)
+            self.assertIs(Action.DROP, actions[-1])
+            for action in actions[:-1]:
+                engine.apply(action)
+            falling = model.falling_figure
+            self.assertEqual(
+                (placement.rotation, placement.row, placement.column),
+                (falling.rotation, falling.row + falling.drop_distance(),
+                 falling.column))
+            engine.apply(Action.DROP)
+            engine.tick()
+            if engine.game_over:
+                break
+
+    def test_decided_actions_on_large_field(self):
+        model = logic_model.LogicModel(
+            40, 120, generator=figure_generator.FigureGenerator(3),
+            walls='random', walls_seed=3)
+        engine = game_engine.GameEngine(model)
+        placement_ai = ai.PlacementAI()
+        for _ in range(10):
+            placement = placement_ai.best_placement(model)
+            for action in placement_ai.decide(model)[:-1]:
+                engine.apply(action)
+            falling = model.falling_figure
+            self.assertEqual(
+                (placement.rotation, placement.row, placement.column),
+                (falling.rotation, falling.row + falling.drop_distance(),
+                 falling.column))
+            engine.apply(Action.DROP)
+            engine.tick()
+
+    def test_incremental_evaluation_matches_full_evaluation(self):
+        generator = random.Random(4)
+        placement_ai = ai.PlacementAI()
+        board = field.Field(8, 16, walls='random', walls_seed=4)
+        for row in range(6, 16):
+            for column in range(8):
+                if (not board.is_wall(row, column) and
+                        generator.random() < 0.6):
+                    board.set_cell(row, column,
+                                   generator.choice(list(Color)))
+
+        rotations = falling_figure.FIGURES_ROTATIONS[figure.Figure.T_FIGURE][0]
+        for placement in ai.PlacementAI.placements(board, rotations, 0, 0, 3):
+            if placement.row < 0:
+                continue
+            cells = [(placement.row + row, placement.column + column)
+                     for row, column in rotations[placement.rotation]]
+            base = placement_ai._base_features(board)
+            for row, column in cells:
+                board.set_cell(row, column, Color.GREEN)
+            self.assertEqual(
+                placement_ai.evaluate(board),
+                placement_ai._value(*placement_ai._placement_features(
+                    board, base, cells, Color.GREEN)))
+            for row, column in cells:
+                board.set_cell(row, column, None)
+
+    def test_field_hash_is_incremental(self):
+        board = field.Field(10, 10)
+        generator = random.Random(1)
+        for _ in range(200):
+            board.set_cell(generator.randrange(10), generator.randrange(10),
+                           generator.choice([None, *Color]))
+        board_hash = board.hash
+        board._rebuild_indexes()
+        self.assertEqual(board_hash, board.hash)
+        self.assertEqual(board.hash, board.copy().hash)
+
+    def test_transposition_table_is_bounded(self):
+        table = ai.TranspositionTable(2)
+        table.put('a', 1)
+        table.put('b', 2)
+        self.assertEqual(1, table.get('a'))
+        table.put('c', 3)
+        self.assertIsNone(table.get('b'))
+        self.assertEqual(2, len(table))
+        self.assertEqual((1, 1), (table.hits, table.misses))
+
+
+class SnapshotTests(unittest.TestCase):
+    @staticmethod
+    def _state(model):
+        return ([list(items) for items in model.field.matrix],
+                model.field.hash, model.field.scores,
+                [(position.row, position.column)
+                 for position in model.falling_figure.positions_list],
+                model.next_figure,
+                model.next_color, model.figures_count)
+
+    @staticmethod
+    def _play(engine, generator, figures):
+        for _ in range(figures):
+            for action in self_play.random_policy(engine.logic_model,
+                                                  generator):
+                engine.apply(action)
+            engine.tick()
+
+    def test_field_restores_nested_snapshots(self):
+        board = field.Field(10, 10)
+        generator = random.Random(2)
+
+        def scribble():
+            for _ in range(50):
+                board.set_cell(generator.randrange(10),
+                               generator.randrange(10),
+                               generator.choice([None, *Color]))
+
+        scribble()
+        outer_matrix = [list(items) for items in board.matrix]
+        outer_hash = board.hash
+        outer = board.snapshot()
+        scribble()
+        inner_matrix = [list(items) for items in board.matrix]
+        inner = board.snapshot()
+        board.scores = 10
+        scribble()
+
+        board.restore(inner)
+        self.assertEqual(inner_matrix, board.matrix)
+        self.assertEqual(0, board.scores)
+        scribble()
+        board.restore(outer)
+        self.assertEqual(outer_matrix, board.matrix)
+        self.assertEqual(outer_hash, board.hash)
+        with self.assertRaises(ValueError):
+            board.restore(inner)
+
+        board.release(outer)
+        self.assertIsNone(board._journal)
+
+    def test_released_snapshots_trim_the_journal(self):
+        board = field.Field(10, 10)
+        first = board.snapshot()
+        board.set_cell(1, 1, Color.RED)
+        second = board.snapshot()
+        board.set_cell(2, 2, Color.RED)
+        board.release(first)
+        self.assertEqual(1, len(board._journal))
+        board.restore(second)
+        self.assertEqual(Color.RED, board.get_cell(1, 1))
+        self.assertIsNone(board.get_cell(2, 2))
+
+    def test_matrix_is_not_replaced_under_open_snapshots(self):
+        model = logic_model.LogicModel()
+        matrix = [list(items) for items in model.field.matrix]
+        snapshot = model.snapshot()
+        with self.assertRaises(ValueError):
+            model.field.matrix = matrix
+        model.restore(snapshot)
+        model.release(snapshot)
+        model.field.matrix = matrix
+
+    def test_logic_model_branches_are_reproducible(self):
+        model = logic_model.LogicModel(
+            generator=figure_generator.FigureGenerator(2, 'bag'))
+        model.field.min_rectangle_area = 4
+        self._play(game_engine.GameEngine(model), random.Random(0), 10)
+        state = self._state(model)
+        snapshot = model.snapshot()
+
+        outcomes = []
+        for _ in range(2):
+            self._play(game_engine.GameEngine(model), random.Random(1), 15)
+            outcomes.append(self._state(model))
+            model.restore(snapshot)
+            self.assertEqual(state, self._state(model))
+        self.assertEqual(outcomes[0], outcomes[1])
+        self.assertGreater(outcomes[0][2], state[2])
+
+    def test_engine_undoes_placed_figures(self):
+        model = logic_model.LogicModel(
+            generator=figure_generator.FigureGenerator(5))
+        model.field.min_rectangle_area = 4
+        engine = game_engine.GameEngine(model, undo_depth=2)
+        states = [self._state(model)]
+        generator = random.Random(5)
+        for _ in range(4):
+            for action in self_play.random_policy(model, generator):
+                engine.apply(action)
+            states.append(self._state(model))
+            engine.tick()
+
+        self.assertTrue(engine.undo())
+        self.assertEqual(states[-2], self._state(model))
+        self.assertTrue(engine.undo())
+        self.assertEqual(states[-3], self._state(model))
+        self.assertFalse(engine.undo())
+        self.assertFalse(game_engine.GameEngine(model).undo())
+
+    def test_released_snapshots_trim_the_figure_history(self):
+        model = logic_model.LogicModel(
+            generator=figure_generator.FigureGenerator(6))
+        model.field.min_rectangle_area = 4
+        engine = game_engine.GameEngine(model, undo_depth=2)
+        generator = random.Random(6)
+        states = []
+        for _ in range(12):
+            for action in self_play.random_policy(model, generator):
+                engine.apply(action)
+            states.append(self._state(model))
+            engine.tick()
+            self.assertLessEqual(len(model.generator._history), 5)
+
+        self.assertTrue(engine.undo())
+        self.assertEqual(states[-2], self._state(model))
+        snapshot = model.snapshot()
+        model.release(snapshot)
+        for snapshot, _, _, _ in list(engine.history):
+            model.release(snapshot)
+        self.assertIsNone(model.generator._history)
+
+    def test_replays_record_undo(self):
+        model = logic_model.LogicModel(
+            generator=figure_generator.FigureGenerator(9))
+        model.field.min_rectangle_area = 4
+        engine = game_engine.GameEngine(
+            model, undo_depth=game_engine.GameEngine.UNDO_DEPTH)
+        recorder = replay.ReplayRecorder(model)
+        generator = random.Random(9)
+        while not engine.game_over:
+            if generator.random() < 0.3 and engine.undo():
+                recorder.undo(engine.ticks)
+            for action in self_play.random_policy(model, generator):
+                recorder.action(engine.ticks, action)
+                engine.apply(action)
+            engine.tick()
+        recorder.end(engine.ticks, model.field.scores)
+
+        reader = replay.ReplayReader(io.BytesIO(bytes(recorder.data)))
+        games = list(replay.ReplayPlayer(reader).games())
+        self.assertEqual([(model.field.scores, model.figures_count)],
+                         [(game.scores, game.figures_count)
+                          for game in games])
+
+
+class ReplayTests(unittest.TestCase):
+    def test_varint_round_trip(self):
+        values = [0, 1, 127, 128, 300, 2 ** 32, 2 ** 70]
+        buffer = bytearray()
+        for value in values:
+            replay.write_varint(buffer, value)
+        file = io.BytesIO(bytes(buffer))
+        self.assertEqual(values,
+                         [replay.read_varint(file) for _ in values])
+        self.assertIsNone(replay.read_varint(file))
+        with self.assertRaises(replay.ReplayError):
+            replay.read_varint(io.BytesIO(b'\x80'))
+
+    def test_self_play_replays_reproduce_results(self):
+        for policy in ('random', 'ai'):
+            for seed in range(3):
+                result = self_play.play_game(seed, policy, record=True)
+                reader = replay.ReplayReader(io.BytesIO(result.replay))
+                games = list(replay.ReplayPlayer(reader).games())
+                self.assertEqual(1, len(games))
+                self.assertEqual(
+                    (result.scores, result.scores, result.level,
+                     result.ticks, result.figures_count),
+                    (games[0].claimed_scores, games[0].scores,
+                     games[0].level, games[0].ticks,
+                     games[0].figures_count))
+
+    def test_session_with_restarts_and_color_modes(self):
+        model = logic_model.LogicModel(
+            generator=figure_generator.FigureGenerator(11, 'bag'))
+        engine = game_engine.GameEngine(model, ColorsModes.OFF)
+        recorder = replay.ReplayRecorder(model, ColorsModes.OFF)
+        generator = random.Random(11)
+        expected = []
+        expected_ticks = []
+        for ticks in range(600):
+            if ticks % 150 == 149:
+                expected.append(model.field.scores)
+                expected_ticks.append(engine.ticks)
+                recorder.end(engine.ticks, model.field.scores)
+                engine.restart()
+                recorder.color_mode(engine.ticks, ColorsModes.GRAY)
+                engine.set_color_mode(ColorsModes.GRAY)
+            action = generator.choice(list(Action))
+            recorder.action(engine.ticks, action)
+            engine.apply(action)
+            engine.tick()
+        expected.append(model.field.scores)
+        expected_ticks.append(engine.ticks)
+        recorder.end(engine.ticks, model.field.scores)
+        self.assertTrue(all(0 < ticks <= 150 for ticks in expected_ticks))
+
+        reader = replay.ReplayReader(io.BytesIO(bytes(recorder.data)))
+        self.assertEqual((11, 'bag', ColorsModes.OFF),
+                         (reader.seed, reader.strategy, reader.color_mode))
+        games = list(replay.ReplayPlayer(reader).games())
+        self.assertEqual(expected, [game.scores for game in games])
+        self.assertEqual(expected, [game.claimed_scores for game in games])
+        self.assertEqual(expected_ticks, [game.ticks for game in games])
+        self.assertEqual(expected_ticks,
+                         [game.claimed_ticks for game in games])
+        self.assertLess(len(recorder.data), 3 * 600)
+
+    def test_header_stores_field_configuration(self):
+        model = logic_model.LogicModel(
+            30, 60, generator=figure_generator.FigureGenerator(4),
+            min_rectangle_area=6, walls='random', walls_seed=9)
+        recorder = replay.ReplayRecorder(model)
+        reader = replay.ReplayReader(io.BytesIO(bytes(recorder.data)))
+        self.assertEqual((30, 60, 6, 'random', 9),
+                         (reader.width, reader.height,
+                          reader.min_rectangle_area, reader.walls,
+                          reader.walls_seed))
+        self.assertEqual(model.field.matrix,
+                         reader.create_logic_model().field.matrix)
+
+        header = bytearray(replay.MAGIC_V1)
+        for value in (4, 0, 10, 20, 9, 0):
+            replay.write_varint(header, value)
+        reader = replay.ReplayReader(io.BytesIO(bytes(header)))
+        self.assertEqual(('alternating', 0, 9),
+                         (reader.walls, reader.walls_seed,
+                          reader.create_logic_model().field
+                          .min_rectangle_area))
+
+        header[len(replay.MAGIC_V1) + 4] = 0
+        with self.assertRaises(replay.ReplayError):
+            replay.ReplayReader(io.BytesIO(bytes(header)))
+
+    def test_verify_replay_reports_mismatches(self):
+        result = self_play.play_game(2, 'ai', record=True)
+        self.assertGreater(result.scores, 0)
+        tampered = bytearray(result.replay)
+        tampered[-1] += 1
+        with tempfile.TemporaryDirectory() as directory:
+            replays = {'valid': result.replay, 'tampered': tampered,
+                       'truncated': result.replay[:-1],
+                       'foreign': b'not a replay'}
+            for name, data in replays.items():
+                with open(os.path.join(directory, name), 'wb') as file:
+                    file.write(data)
+
+            mismatches = {name: list(replay.verify_replay(
+                os.path.join(directory, name))) for name in replays}
+        self.assertEqual([], mismatches['valid'])
+        self.assertEqual(
+            [(0, result.scores + 1, result.scores, result.ticks,
+              result.ticks, None)],
+            [(mismatch.game, mismatch.claimed_scores, mismatch.scores,
+              mismatch.claimed_ticks, mismatch.ticks, mismatch.error)
+             for mismatch in mismatches['tampered']])
+        for name in ('truncated', 'foreign'):
+            self.assertEqual(1, len(mismatches[name]))
+            self.assertIsNotNone(mismatches[name][0].error)
+
+
+class NetworkTests(unittest.TestCase):
+    @staticmethod
+    def read_messages(data, max_size=protocol.MAX_SERVER_MESSAGE_SIZE):
+        async def read():
+            reader = asyncio.StreamReader()
+            reader.feed_data(data)
+            reader.feed_eof()
+            messages = []
+            message = await protocol.read_message(reader, max_size)
+            while message is not None:
+                messages.append(message)
+                message = await protocol.read_message(reader, max_size)
+            return messages
+
+        return asyncio.run(read())
+
+    def test_messages_round_trip(self):
+        board = field.Field(8, 12, walls='random', walls_seed=2)
+        board.set_cell(11, 3, Color.BLUE)
+        board.set_cell(10, 3, Color.RED)
+        all_cells = {(row, column) for row in range(12)
+                     for column in range(8)}
+        data = (protocol.encode(protocol.SCORES, 300, 2) +
+                protocol.encode_cells(protocol.BOARD, board, all_cells) +
+                protocol.encode_cells(protocol.CELLS, board,
+                                      {(10, 3), (0, 4)}))
+
+        (scores, board_message, cells_message) = self.read_messages(data)
+        self.assertEqual((protocol.SCORES, [300, 2]), scores)
+        self.assertEqual(
+            {(row, column, board.get_cell(row, column))
+             for row, column in all_cells
+             if board.get_cell(row, column) is not None},
+            set(protocol.decode_cells(board_message[1], 8)))
+        self.assertEqual(
+            [(0, 4, None), (10, 3, Color.RED)],
+            list(protocol.decode_cells(cells_message[1], 8)))
+
+        for data in (b'\x05\x01', b'\x80', protocol.encode(1, 2 ** 40)):
+            with self.assertRaises((protocol.ProtocolError,
+                                    asyncio.IncompleteReadError)):
+                self.read_messages(data, 4)
+
+        async def read_endless_length():
+            reader = asyncio.StreamReader()
+            reader.feed_data(b'\xff' * 6)
+            return await asyncio.wait_for(protocol.read_message(reader, 4), 1)
+
+        with self.assertRaises(protocol.ProtocolError):
+            asyncio.run(read_endless_length())
+
+    def test_bots_mirror_server_games(self):
+        async def play():
+            game_server = server.GameServer(seed=3, speed=50)
+            port = await game_server.start()
+            mirrored = []
+
+            def compare(game_client):
+                session = game_server.sessions[game_client.session_id]
+                mirrored.append((
+                    game_client.field.matrix == session.logic_model.field
+                    .matrix, game_client.scores ==
+                    int(session.logic_model.field.scores)))
+
+            results = await asyncio.gather(*[
+                client.run_bot(port=port, seed=index, games=2,
+                               on_game_over=compare)
+                for index in range(20)])
+            await game_server.close()
+            return results, mirrored, game_server
+
+        results, mirrored, game_server = asyncio.run(play())
+        self.assertEqual([(True, True)] * 40, mirrored)
+        self.assertEqual([2] * 20, [len(result.scores) for result in results])
+        self.assertEqual(20, len({result.session_id for result in results}))
+        self.assertEqual({}, game_server.sessions)
+
+    def test_invalid_messages_close_the_session(self):
+        async def connect():
+            game_server = server.GameServer(speed=50)
+            port = await game_server.start()
+            game_client = await client.GameClient.connect(port=port)
+            sessions_count = len(game_server.sessions)
+            game_client.writer.write(protocol.encode(protocol.ACTION, 99))
+            while await game_client.receive() is not None:
+                pass
+            game_client.close()
+
+            reader, writer = await asyncio.open_connection('127.0.0.1', port)
+            writer.write(protocol.encode(protocol.HELLO, protocol.VERSION + 1))
+            refused = await reader.read() == b''
+            writer.close()
+
+            game_server.HELLO_TIMEOUT = 0.05
+            reader, writer = await asyncio.open_connection('127.0.0.1', port)
+            timed_out = await reader.read() == b''
+            writer.close()
+            await game_server.close()
+            return sessions_count, game_server.sessions, refused, timed_out
+
+        self.assertEqual((1, {}, True, True), asyncio.run(connect()))
+
+
+@unittest.skipIf(batch_field is None, 'numpy is not installed')
+class BatchFieldTests(unittest.TestCase):
+    def setUp(self):
+        generator = random.Random(0)
+        self.fields = []
+        for _ in range(200):
+            board = field.Field(10, 20, full_scan=True,
+                                min_rectangle_area=generator.choice([1, 4]))
+            density = generator.random()
+            for row in range(board.height):
+                for column in range(board.width):
+                    if (not board.is_wall(row, column) and
+                            generator.random() < density):
+                        board.set_cell(row, column, generator.choice(
+                            [Color.RED, Color.RED, *Color]))
+            self.fields.append(board)
+        self.batch = batch_field.BatchField.from_fields(self.fields)
+        self.batch.min_rectangle_area = 4
+        for board in self.fields:
+            board.min_rectangle_area = 4
+
+    def test_rectangles_match_scalar_field(self):
+        areas, colors, _, _, _, _ = self.batch.search_max_area_rectangles()
+        for index, board in enumerate(self.fields):
+            expected = board._search_max_area_rectangle()
+            actual = self.batch.max_area_rectangle(index)
+            if expected is None:
+                self.assertIsNone(actual)
+                self.assertEqual(0, areas[index])
+                continue
+            self.assertEqual(
+                (expected[0], vars(expected[1]), vars(expected[2])),
+                (actual[0], vars(actual[1]), vars(actual[2])))
+            rectangle_color = board.get_cell(expected[1].row,
+                                             expected[1].column)
+            self.assertEqual(rectangle_color.value, colors[index])
+
+    def test_rectangles_match_scalar_field_on_wide_boards(self):
+        generator = random.Random(2)
+        fields = []
+        for _ in range(50):
+            board = field.Field(30, 12, full_scan=True, min_rectangle_area=4,
+                                walls='random', walls_seed=len(fields))
+            for row in range(board.height):
+                for column in range(board.width):
+                    if (not board.is_wall(row, column) and
+                            generator.random() < 0.8):
+                        board.set_cell(row, column, generator.choice(
+                            [Color.RED, Color.RED, Color.BLUE]))
+            fields.append(board)
+        batch = batch_field.BatchField.from_fields(fields)
+        for index, board in enumerate(fields):
+            expected = board._search_max_area_rectangle()
+            actual = batch.max_area_rectangle(index)
+            self.assertEqual(
+                (expected[0], vars(expected[1]), vars(expected[2])),
+                (actual[0], vars(actual[1]), vars(actual[2])))
+
+    def test_min_rectangle_area_matches_field(self):
+        codes = self.batch.codes[:, :, :1]
+        self.assertEqual(1, batch_field.BatchField(codes).min_rectangle_area)
+        for min_rectangle_area in (0, -1):
+            with self.assertRaises(ValueError):
+                batch_field.BatchField(codes, min_rectangle_area)
+
+    def test_collision_and_placement_match_scalar_field(self):
+        generator = random.Random(1)
+        _figure = figure.Figure.T_FIGURE
+        shape = falling_figure.FIGURES_ROTATIONS[_figure][0][1]
+        rows = [generator.randrange(-3, 20) for _ in self.fields]
+        columns = [generator.randrange(-1, 10) for _ in self.fields]
+        collisions = self.batch.collides(shape, rows, columns)
+        drop_rows = self.batch.drop_rows(shape, rows, columns)
+        self.batch.place(shape, drop_rows, columns, Color.BLUE,
+                         ~collisions)
+
+        for index, board in enumerate(self.fields):
+            falling = falling_figure.FallingFigure(board, _figure,
+                                                   Color.BLUE)
+            falling.rotation = 1
+            falling.row = -board.height
+            self.assertEqual(
+                not falling._check_position(rows[index], columns[index],
+                                            shape),
+                collisions[index])
+            if not collisions[index]:
+                falling.row, falling.column = rows[index], columns[index]
+                falling.display_figure_on_field()
+                falling.drop_figure()
+                self.assertEqual(falling.row, drop_rows[index])
+            self.assertEqual(board.matrix,
+                             self.batch.to_field(index).matrix)
+
+    def test_features_match_evaluation(self):
+        placement_ai = ai.PlacementAI({'aggregate_height': 1, 'max_height': 0,
+                                       'holes': 0, 'bumpiness': 0,
+                                       'adjacency': 0})
+        heights = self.batch.heights().sum(axis=1)
+        for index, board in enumerate(self.fields):
+            self.assertEqual(placement_ai.evaluate(board), heights[index])
+
+        placement_ai.weights.update(aggregate_height=0, holes=1)
+        holes = self.batch.holes()
+        for index, board in enumerate(self.fields):
+            self.assertEqual(placement_ai.evaluate(board), holes[index])
+
 
 if __name__ == '__main__':
     unittest.main()
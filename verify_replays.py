@@ -0,0 +1,74 @@
+from concurrent.futures import FIRST_COMPLETED, ProcessPoolExecutor, wait
+import argparse
+import os
+import sys
+
+from model import replay
+
+
+def parse_arguments():
+    parser = argparse.ArgumentParser(
+        description='Re-simulate recorded Tetris replays and report games '
+                    'whose claimed scores do not match.')
+    parser.add_argument('paths', nargs='+', metavar='PATH',
+                        help='replay file or directory of replays')
+    parser.add_argument('-w', '--workers', type=int, default=os.cpu_count())
+    return parser.parse_args()
+
+
+def replay_paths(paths):
+    for path in paths:
+        if not os.path.isdir(path):
+            yield path
+            continue
+        for directory, _, file_names in os.walk(path):
+            for file_name in sorted(file_names):
+                if file_name.endswith('.trp'):
+                    yield os.path.join(directory, file_name)
+
+
+def verify_file(path):
+    return list(replay.verify_replay(path))
+
+
+def print_mismatch(mismatch):
+    if mismatch.error is not None:
+        print('{}: {}'.format(mismatch.path, mismatch.error))
+    else:
+        print('{}: game {}: claimed {} in {} ticks, simulated {} in {} '
+              'ticks'.format(mismatch.path, mismatch.game,
+                             mismatch.claimed_scores, mismatch.claimed_ticks,
+                             mismatch.scores, mismatch.ticks))
+
+
+def report(futures):
+    mismatches_count = 0
+    for future in futures:
+        for mismatch in future.result():
+            print_mismatch(mismatch)
+            mismatches_count += 1
+    return mismatches_count
+
+
+def main():
+    arguments = parse_arguments()
+    replays_count = 0
+    mismatches_count = 0
+
+    with ProcessPoolExecutor(arguments.workers) as executor:
+        pending = set()
+        for path in replay_paths(arguments.paths):
+            if len(pending) >= 4 * arguments.workers:
+                done, pending = wait(pending, return_when=FIRST_COMPLETED)
+                mismatches_count += report(done)
+            pending.add(executor.submit(verify_file, path))
+            replays_count += 1
+        mismatches_count += report(wait(pending).done)
+
+    print('replays: {}, mismatches: {}'.format(replays_count,
+                                               mismatches_count))
+    return 1 if mismatches_count else 0
+
+
+if __name__ == '__main__':
+    sys.exit(main())
@@ -1 +1 @@
-__all__ = ['game_window']
+__all__ = ['board_widget', 'game_window']
@@ -0,0 +1,80 @@
+from PyQt5.QtWidgets import QWidget
+from PyQt5.QtGui import QBrush, QColor, QPainter
+from PyQt5.QtCore import QRect
+
+
+class BoardWidget(QWidget):
+    __BRUSHES = {}
+    __UPDATE_RECTS = 64
+
+    def __init__(self, rows, columns, cell_size, spacing=2,
+                 color='white'):
+        super().__init__()
+        self.rows = rows
+        self.columns = columns
+        self.cell_size = cell_size
+        self.spacing = spacing
+        self.colors = [[color for _ in range(columns)] for _ in range(rows)]
+        self.setFixedSize(columns * (cell_size + spacing) - spacing,
+                          rows * (cell_size + spacing) - spacing)
+
+    @classmethod
+    def _brush(cls, color):
+        brush = cls.__BRUSHES.get(color)
+        if brush is None:
+            brush = cls.__BRUSHES[color] = QBrush(QColor(color))
+        return brush
+
+    def _cell_rect(self, row, column):
+        step = self.cell_size + self.spacing
+        return QRect(column * step, row * step, self.cell_size,
+                     self.cell_size)
+
+    def set_cell_color(self, row, column, color):
+        if self.colors[row][column] != color:
+            self.colors[row][column] = color
+            self.update(self._cell_rect(row, column))
+
+    def set_colors(self, colors):
+        self.colors = colors
+        self.update()
+
+    def set_cells_colors(self, cells_colors):
+        changed_cells = []
+        for row, column, color in cells_colors:
+            if self.colors[row][column] != color:
+                self.colors[row][column] = color
+                changed_cells.append((row, column))
+
+        if len(changed_cells) <= self.__UPDATE_RECTS:
+            for row, column in changed_cells:
+                self.update(self._cell_rect(row, column))
+        else:
+            rows = [row for row, _ in changed_cells]
+            columns = [column for _, column in changed_cells]
+            self.update(self._cell_rect(min(rows), min(columns)).united(
+                self._cell_rect(max(rows), max(columns))))
+
+    def paintEvent(self, event):
+        step = self.cell_size + self.spacing
+        rect = event.rect()
+        first_column = max(0, rect.left() // step)
+        last_column = min(self.columns, rect.right() // step + 1)
+        painter = QPainter(self)
+        for row in range(max(0, rect.top() // step),
+                         min(self.rows, rect.bottom() // step + 1)):
+            colors = self.colors[row]
+            if self.spacing:
+                for column in range(first_column, last_column):
+                    painter.fillRect(self._cell_rect(row, column),
+                                     self._brush(colors[column]))
+                continue
+
+            start = first_column
+            for column in range(first_column + 1, last_column + 1):
+                if column == last_column or colors[column] != colors[start]:
+                    painter.fillRect(start * step, row * step,
+                                     (column - start) * step, step,
+                                     self._brush(colors[start]))
+                    start = column
+        painter.end()
@@ -1,17 +1,27 @@
 from PyQt5.QtWidgets import (
     QDesktopWidget, QMessageBox, QGridLayout, QWidget, QMainWindow, QLabel,
-    QHBoxLayout, QVBoxLayout, QToolButton)
-from PyQt5.QtGui import QCloseEvent, QIcon
-from PyQt5.QtCore import Qt, QCoreApplication, QTimer
+    QHBoxLayout, QVBoxLayout, QToolButton, QScrollArea, QFrame, QStyle)
+from PyQt5.QtGui import QCloseEvent, QGuiApplication, QIcon
+from PyQt5.QtCore import Qt, QCoreApplication, QElapsedTimer, QPoint, QTimer
 from os import path
 from pathlib import Path
 import pickle
+import time
 
 from model.color import Color
 from model.wall import Wall
-from view.colors_modes import ColorsModes
-from model.direction import Direction
+from model.colors_modes import ColorsModes
+from model.action import Action
+from model.game_engine import GameEngine
+from model.game_loop import FrameTimings, GameLoop
+from model.ai import PlacementAI
+from model.profiler import Profiler
+from model.replay import ReplayRecorder
+from model.events import (
+    CellsChanged, GameOver, GameRestarted, PieceLocked, PieceSpawned,
+    ScoresChanged, SnapshotRestored)
 from model import falling_figure
+from view.board_widget import BoardWidget
 
 
 class GameWindow(QMainWindow):
@@ -28,17 +38,26 @@ class GameWindow(QMainWindow):
         ColorsModes.GRAY: 'gray',
         ColorsModes.ON: 'green'
     }
-    __MODES_MULCT = {
-        ColorsModes.OFF: 1,
-        ColorsModes.GRAY: 0.75,
-        ColorsModes.ON: 0.6
+    __GHOST_COLOR = 'gainsboro'
+
+    __KEYS_ACTIONS = {
+        Qt.Key_Left: Action.LEFT,
+        Qt.Key_Right: Action.RIGHT,
+        Qt.Key_Down: Action.DOWN,
+        Qt.Key_Up: Action.ROTATE,
+        Qt.Key_Space: Action.DROP
     }
 
-    __TICK_TIME = 500
     __CELL_SIZE = 18
+    __MIN_CELL_SIZE = 4
+    __PANEL_WIDTH = 6 * __CELL_SIZE
+    __CHROME_HEIGHT = 5 * __CELL_SIZE
     __RECORD_TABLE_FILE = 'record_table.txt'
+    __REPLAYS_DIRECTORY = 'replays'
+    __PROFILES_DIRECTORY = 'profiles'
+    __OVERLAY_FRAMES = 30
 
-    def __init__(self, logic_model):
+    def __init__(self, logic_model, replay_player=None, preview_count=1):
         super().__init__()
 
         self._record_list = self._record_list_create()
@@ -47,24 +66,63 @@ class GameWindow(QMainWindow):
             self._record_list = [None for _ in range(8)]
 
         self.logic_model = logic_model
-        self._cells_matrix, self._cells_panel, self._record_panel = \
+        self.replay_player = replay_player
+        self.preview_count = preview_count
+        if replay_player is None:
+            self.engine = GameEngine(logic_model,
+                                     undo_depth=GameEngine.UNDO_DEPTH)
+            self.recorder = ReplayRecorder(logic_model,
+                                           self.engine.color_mode)
+            self._replay_path = path.join(
+                self.__REPLAYS_DIRECTORY,
+                time.strftime('%Y%m%d-%H%M%S.trp'))
+        else:
+            self.engine = replay_player.engine
+            self.recorder = None
+        self.assistant = PlacementAI()
+        self._board, self._next_figure_panel, self._record_panel = \
             self._central_widget_create()
-        self.color_mode = ColorsModes.ON
-        self.current_scores = 0
+        self._ghost_cells = set()
         self.current_rating_position = -1
         self._record_panel_update()
-        self.current_level = self.logic_model.field.current_level
+
+        if replay_player is None:
+            self.loop = GameLoop(self.engine, self.recorder.action)
+        else:
+            self.loop = GameLoop(self.engine,
+                                 before_tick=self._play_replay_events)
+        self.frame_timings = FrameTimings()
+        self.profiler = Profiler()
+        self._profile_overlay = self._profile_overlay_create()
+        self._profile_snapshot = {}
+        self._profile_frames = 0
+        self._pending_events = []
+        self._clock = QElapsedTimer()
+        self._clock.start()
 
         self.timer = QTimer(self)
+        self.timer.setTimerType(Qt.PreciseTimer)
         self.timer.timeout.connect(self._timer_tick)
-        self.timer.start(self.__TICK_TIME)
+        self.timer.start(self._frame_interval())
 
         self.__window_tune()
+        self.logic_model.events.add_listener(self._pending_events.extend)
+        self.logic_model.events.flush()
+        self._render()
+        self._next_figure_panel_update()
+
+    @staticmethod
+    def _frame_interval():
+        screen = QGuiApplication.primaryScreen()
+        refresh_rate = screen.refreshRate() if screen is not None else 0
+        return max(1, round(1000 / (refresh_rate or 60)))
+
+    def _start_timer(self):
+        if not self.engine.game_over and self.loop.running:
+            self._clock.restart()
+            self.timer.start()
 
     def __window_tune(self):
-        self.setMaximumSize(
-            self.__CELL_SIZE * (self.logic_model.field.width + 4),
-            self.__CELL_SIZE * self.logic_model.field.height)
         self.setWindowTitle('Tetris')
         self.setWindowIcon(QIcon(path.join('icons', 'bird.png')))
         self.status_bar = self.statusBar()
@@ -72,6 +130,7 @@ class GameWindow(QMainWindow):
             int(self.logic_model.field.scores)))
         self.toolbar = self.addToolBar('')
         self.color_mode_button = self.toolbar_create()
+        self.setMaximumSize(self.sizeHint())
         self._move_center()
         self.show()
 
@@ -90,18 +149,21 @@ class GameWindow(QMainWindow):
         return color_mode_button
 
     def _change_color_mode(self):
-        if not self.logic_model.fell_flag:
-            if self.color_mode == ColorsModes.ON:
-                self.color_mode = ColorsModes.OFF
-            elif self.color_mode == ColorsModes.OFF:
-                self.color_mode = ColorsModes.GRAY
-            else:
-                self.color_mode = ColorsModes.ON
+        if self.engine.color_mode == ColorsModes.ON:
+            color_mode = ColorsModes.OFF
+        elif self.engine.color_mode == ColorsModes.OFF:
+            color_mode = ColorsModes.GRAY
+        else:
+            color_mode = ColorsModes.ON
 
+        if self.replay_player is None and \
+                self.engine.set_color_mode(color_mode):
+            self.recorder.color_mode(self.engine.ticks, color_mode)
             self.color_mode_button.setStyleSheet(
                 'background-color: {};'.format(
-                    self.__COLORS_MODES[self.color_mode])
+                    self.__COLORS_MODES[color_mode])
             )
+            self._next_figure_panel_update()
 
     def _record_list_create(self):
         if not Path(self.__RECORD_TABLE_FILE).exists():
@@ -118,24 +180,10 @@ class GameWindow(QMainWindow):
         h_box = QHBoxLayout()
         right_panel = QVBoxLayout()
 
-        next_figure_panel = QGridLayout()
-        next_figure_panel.setSpacing(2)
-
-        cells_panel_size = 4
-        cells_panel = [[None for _ in range(cells_panel_size)] for _ in
-                       range(cells_panel_size)]
-
-        for i in range(cells_panel_size):
-            for j in range(cells_panel_size):
-                cell = QLabel()
-                cell.setFixedSize(self.__CELL_SIZE, self.__CELL_SIZE)
-                cell.setStyleSheet('background-color: {};'.format(
-                    self.__COLORS_MATCHING[None]))
-                next_figure_panel.addWidget(cell, i, j)
-                cells_panel[i][j] = cell
-
-        right_panel.addLayout(next_figure_panel)
-        right_panel.setSpacing(9 * self.__CELL_SIZE - 2)
+        next_figure_panel = BoardWidget(4 * self.preview_count, 4,
+                                        self.__CELL_SIZE)
+        right_panel.addWidget(next_figure_panel)
+        right_panel.addStretch()
 
         score_table = QGridLayout()
         score_table.setSpacing(2)
@@ -155,81 +203,169 @@ class GameWindow(QMainWindow):
 
         right_panel.addLayout(score_table)
 
-        grid = QGridLayout()
-        grid.setSpacing(2)
-
-        cells_matrix = [[None for _ in range(self.logic_model.field.width)]
-                        for _ in range(self.logic_model.field.height)]
-
-        for i in range(self.logic_model.field.height):
-            for j in range(self.logic_model.field.width):
-                cell = QLabel()
-                cell.setFixedSize(self.__CELL_SIZE, self.__CELL_SIZE)
-                cell.setStyleSheet('background-color: {};'.format(
-                    self.__COLORS_MATCHING[self.logic_model.field.matrix[i][j]]
-                ))
-                grid.addWidget(cell, i, j)
-                cells_matrix[i][j] = cell
-
-        h_box.addLayout(grid)
+        field = self.logic_model.field
+        geometry = QDesktopWidget().availableGeometry()
+        max_width = geometry.width() - self.__PANEL_WIDTH
+        max_height = geometry.height() - self.__CHROME_HEIGHT
+        step = max(self.__MIN_CELL_SIZE,
+                   min(self.__CELL_SIZE + 2, max_width // field.width,
+                       max_height // field.height))
+        spacing = 2 if step >= 10 else 1 if step >= 6 else 0
+        board = BoardWidget(field.height, field.width, step - spacing,
+                            spacing)
+
+        if board.width() <= max_width and board.height() <= max_height:
+            self._board_view = None
+            h_box.addWidget(board)
+        else:
+            self._board_view = QScrollArea()
+            self._board_view.setFrameShape(QFrame.NoFrame)
+            self._board_view.setFocusPolicy(Qt.NoFocus)
+            self._board_view.setWidget(board)
+            extent = self._board_view.style().pixelMetric(
+                QStyle.PM_ScrollBarExtent)
+            self._board_view.setFixedSize(
+                min(board.width() + extent, max_width),
+                min(board.height() + extent, max_height))
+            h_box.addWidget(self._board_view)
         h_box.addLayout(right_panel)
         game_field_widget = QWidget()
         game_field_widget.setLayout(h_box)
         self.setCentralWidget(game_field_widget)
 
-        return cells_matrix, cells_panel, lines_panel
-
-    def _grid_update(self):
-        for i in range(self.logic_model.field.height):
-            for j in range(self.logic_model.field.width):
-                color = self.__COLORS_MATCHING[
-                    self.logic_model.field.matrix[i][j]]
-                self._cells_matrix[i][j].setStyleSheet(
-                    'background-color: {};'.format(color))
+        return board, next_figure_panel, lines_panel
+
+    def _profile_overlay_create(self):
+        overlay = QLabel(self)
+        overlay.setStyleSheet('background-color: rgba(0, 0, 0, 160); '
+                              'color: white; font: 8pt monospace;')
+        overlay.setAttribute(Qt.WA_TransparentForMouseEvents)
+        overlay.hide()
+        return overlay
+
+    def _toggle_profiling(self):
+        if self.profiler.enabled:
+            self.profiler.disable()
+            self._profile_overlay.hide()
+            self._dump_profile()
+            return
+
+        self.profiler.reset()
+        self.profiler.enable()
+        self.profiler.instrument(GameWindow, '_grid_update')
+        self._profile_snapshot = self.profiler.snapshot()
+        self._profile_frames = 0
+        self._profile_overlay.setText('Profiling')
+        self._profile_overlay.adjustSize()
+        self._profile_overlay.move(self._board.mapTo(self, QPoint(0, 0)))
+        self._profile_overlay.show()
+        self._profile_overlay.raise_()
+
+    def _profile_overlay_update(self):
+        snapshot = self.profiler.snapshot()
+        frames = self._profile_frames
+        rows = []
+        for name, (calls, total_time, _) in snapshot.items():
+            previous_calls, previous_time, _ = \
+                self._profile_snapshot.get(name, (0, 0, 0))
+            rows.append(((total_time - previous_time) / frames,
+                         (calls - previous_calls) / frames,
+                         name.rsplit('.', 1)[-1]))
+        rows.sort(reverse=True)
+
+        timings = self.frame_timings
+        lines = ['{:.0f} fps, work {:.2f}/{:.2f} ms'.format(
+            timings.fps, timings.average_work_time, timings.max_work_time)]
+        lines.extend('{:6.3f} ms {:6.1f}x {}'.format(1000 * time_per_frame,
+                                                     calls_per_frame, name)
+                     for time_per_frame, calls_per_frame, name in rows)
+        self._profile_overlay.setText('\n'.join(lines))
+        self._profile_overlay.adjustSize()
+        self._profile_snapshot = snapshot
+        self._profile_frames = 0
+
+    def _dump_profile(self):
+        profile_path = path.join(self.__PROFILES_DIRECTORY,
+                                 time.strftime('%Y%m%d-%H%M%S'))
+        try:
+            Path(self.__PROFILES_DIRECTORY).mkdir(exist_ok=True)
+            self.profiler.dump(profile_path + '.json')
+            self.profiler.dump(profile_path + '.prof')
+        except OSError:
+            pass
+
+    def _grid_update(self, changed_cells):
+        field = self.logic_model.field
+        ghost_cells = set()
+        for position in self.logic_model.falling_figure.ghost_positions():
+            row, column = position.row, position.column
+            if row >= 0 and field.is_free(row, column):
+                ghost_cells.add((row, column))
+
+        colors_matching = self.__COLORS_MATCHING
+        if len(changed_cells) < field.width * field.height:
+            changed_cells = (changed_cells | self._ghost_cells) - ghost_cells
+        else:
+            self._board.set_colors([[colors_matching[item] for item in items]
+                                    for items in field.matrix])
+            changed_cells = ()
+        self._ghost_cells = ghost_cells
+        get_cell = field.get_cell
+        colors = [(row, column, colors_matching[get_cell(row, column)])
+                  for row, column in changed_cells]
+        colors.extend((row, column, self.__GHOST_COLOR)
+                      for row, column in ghost_cells)
+        self._board.set_cells_colors(colors)
+
+    def _follow_falling_figure(self):
+        figure = self.logic_model.falling_figure
+        step = self._board.cell_size + self._board.spacing
+        for row in (figure.row + figure.drop_distance(), figure.row):
+            self._board_view.ensureVisible(
+                (figure.column + 2) * step, (max(0, row) + 2) * step,
+                6 * step, 4 * step)
 
     def _next_figure_panel_update(self):
-        for i in range(len(self._cells_panel)):
-            for j in range(len(self._cells_panel[i])):
-                self._cells_panel[i][j].setStyleSheet(
-                    'background-color: {};'.format(
-                        self.__COLORS_MATCHING[None]))
+        panel = self._next_figure_panel
+        colors = [[self.__COLORS_MATCHING[None] for _ in range(panel.columns)]
+                  for _ in range(panel.rows)]
         row_shift = 3
         column_shift = 1
-        figure = self.logic_model.next_figure
-        for _tuple in falling_figure.FIGURES_POSITIONS[figure]:
-            row = _tuple[0] + row_shift
-            column = _tuple[1] + column_shift
-
-            if self.color_mode == ColorsModes.ON:
-                color = self.__COLORS_MATCHING[self.logic_model.next_color]
-            elif self.color_mode == ColorsModes.GRAY:
-                color = 'gray'
-            else:
-                color = self.__COLORS_MATCHING[None]
-
-            self._cells_panel[row][column].setStyleSheet(
-                'background-color: {};'.format(color))
+        previews = self.logic_model.generator.peek(self.preview_count)
+        for index, (figure, figure_color) in enumerate(previews):
+            for _tuple in falling_figure.FIGURES_POSITIONS[figure]:
+                row = _tuple[0] + row_shift + 4 * index
+                column = _tuple[1] + column_shift
+
+                if self.engine.color_mode == ColorsModes.ON:
+                    color = self.__COLORS_MATCHING[figure_color]
+                elif self.engine.color_mode == ColorsModes.GRAY:
+                    color = 'gray'
+                else:
+                    color = self.__COLORS_MATCHING[None]
+
+                colors[row][column] = color
+
+        panel.set_cells_colors(
+            (row, column, colors[row][column])
+            for row in range(len(colors))
+            for column in range(len(colors[row])))
 
     def _record_panel_update(self):
-        self._record_list.sort()
+        scores = self.logic_model.field.scores
+        if self.current_rating_position < 0:
+            self._previous_records = sorted(self._record_list)
+        records = self._previous_records
 
         i = 0
-        while (i < len(self._record_list) and
-               self.logic_model.field.scores > self._record_list[i]):
+        while i < len(records) and scores > records[i]:
             i += 1
 
-        if i > 0 and i - 1 != self.current_rating_position:
-            if self.current_rating_position >= 0:
-                self._record_list.pop(self.current_rating_position)
-            else:
-                self._record_list.pop(0)
-            self._record_list.insert(i - 1, self.logic_model.field.scores)
-        elif i > 0:
-            self._record_list[self.current_rating_position] = \
-                self.logic_model.field.scores
-
-        current_position = i - 1
-        self.current_rating_position = current_position
+        if i > 0:
+            self._record_list = records[1:i] + [scores] + records[i:]
+        else:
+            self._record_list = list(records)
+        self.current_rating_position = i - 1
 
         for i in range(len(self._record_list)):
             label = self._record_panel[7 - i]
@@ -242,31 +378,68 @@ class GameWindow(QMainWindow):
                     'background-color: {};'.format('rgb(109, 242, 231)')
                 )
 
-    def _timer_tick(self):
-        if not self.logic_model.end_of_the_game():
-            self.logic_model.update()
-            self._grid_update()
-            self._next_figure_panel_update()
-            if self.logic_model.fell_flag:
-                self.color_mode_button.setDisabled(True)
+    def _end_replay_game(self):
+        self.recorder.end(self.engine.ticks, self.logic_model.field.scores)
+        try:
+            Path(self.__REPLAYS_DIRECTORY).mkdir(exist_ok=True)
+            self.recorder.save(self._replay_path)
+        except OSError:
+            pass
 
-            if self.current_scores < self.logic_model.field.scores:
-                self.logic_model.field.scores = \
-                    round(self.logic_model.field.scores * self.__MODES_MULCT[
-                        self.color_mode])
-                self.current_scores = self.logic_model.field.scores
-                self._record_panel_update()
+    def _play_replay_events(self):
+        self.replay_player.apply_due_events()
+        return not self.replay_player.finished
 
-            if self.current_level < self.logic_model.field.current_level:
-                self.current_level += 1
-                self.__TICK_TIME = self.__TICK_TIME * 0.85
-                self.timer.setInterval(self.__TICK_TIME)
-
-            self.status_bar.showMessage('Scores: {}'.format(
-                int(self.logic_model.field.scores)))
-        else:
+    def _timer_tick(self):
+        interval = self._clock.nsecsElapsed() / 1000000
+        self._clock.restart()
+        start_time = time.perf_counter()
+        self.loop.advance(interval)
+        self._render()
+        if not self.loop.running:
             self.timer.stop()
-            self.status_bar.showMessage('End of the game')
+            self.status_bar.showMessage('End of the replay')
+        self.frame_timings.record(
+            interval, 1000 * (time.perf_counter() - start_time))
+        if self.profiler.enabled:
+            self._profile_frames += 1
+            if self._profile_frames >= self.__OVERLAY_FRAMES:
+                self._profile_overlay_update()
+
+    def _render(self):
+        events = self._pending_events[:]
+        self._pending_events.clear()
+        changed_cells = set()
+        for event in events:
+            if isinstance(event, CellsChanged):
+                changed_cells |= event.cells
+            elif isinstance(event, PieceSpawned):
+                self._next_figure_panel_update()
+            elif isinstance(event, PieceLocked):
+                self.color_mode_button.setDisabled(True)
+            elif isinstance(event, ScoresChanged):
+                if self.replay_player is None:
+                    self._record_panel_update()
+                self._show_scores()
+            elif isinstance(event, GameRestarted):
+                self.color_mode_button.setEnabled(True)
+                self._show_scores()
+            elif isinstance(event, SnapshotRestored):
+                self.color_mode_button.setDisabled(
+                    self.logic_model.fell_flag)
+                self._next_figure_panel_update()
+                self._show_scores()
+            elif isinstance(event, GameOver) and self.replay_player is None:
+                self.timer.stop()
+                self.status_bar.showMessage('End of the game')
+                self._end_replay_game()
+        self._grid_update(changed_cells)
+        if self._board_view is not None:
+            self._follow_falling_figure()
+
+    def _show_scores(self):
+        self.status_bar.showMessage('Scores: {}'.format(
+            int(self.logic_model.field.scores)))
 
     def _move_center(self):
         self.move(self.width() * -2, 0)
@@ -290,6 +463,10 @@ class GameWindow(QMainWindow):
             QMessageBox.Yes
         )
         if reply == message_box.Yes:
+            if self.replay_player is None and not self.engine.game_over:
+                self._end_replay_game()
+            if self.profiler.enabled:
+                self._dump_profile()
             try:
                 with open(self.__RECORD_TABLE_FILE, 'wb') as file:
                     pickle.dump(self._record_list, file)
@@ -300,9 +477,8 @@ class GameWindow(QMainWindow):
         else:
             event.ignore()
 
-            self.status_bar.showMessage('Scores: {}'.format(
-                int(self.logic_model.field.scores)))
-            self.timer.start()
+            self._show_scores()
+            self._start_timer()
 
     def keyPressEvent(self, event):
         key = event.key()
@@ -310,47 +486,43 @@ class GameWindow(QMainWindow):
         if key == Qt.Key_Escape:
             self.closeEvent(QCloseEvent())
 
+        elif key == Qt.Key_F3:
+            self._toggle_profiling()
+
+        elif self.replay_player is not None and key != Qt.Key_P:
+            return
+
         elif key == Qt.Key_R:
-            self.logic_model.field.clear_field()
-            self.logic_model.next_figure = None
-            self.logic_model.next_color = None
-            self.logic_model.current_figure = None
-            self.logic_model.current_color = None
-            self.logic_model.falling_figure = falling_figure.FallingFigure(
-                self.logic_model)
-            self.logic_model.fell_flag = False
-            self.color_mode_button.setEnabled(True)
+            if not self.engine.game_over:
+                self._end_replay_game()
+            self.engine.restart()
+            self.loop.reset()
             self.current_rating_position = -1
-            self.current_scores = 0
             self._record_panel_update()
+            self._clock.restart()
             self.timer.start()
 
         elif key == Qt.Key_P:
             if self.timer.isActive():
                 self.status_bar.showMessage('Pause')
                 self.timer.stop()
-            elif not self.logic_model.end_of_the_game():
-                self.timer.start()
-
-        elif self.timer.isActive():
-            if key == Qt.Key_Left:
-                self.logic_model.falling_figure.try_move(Direction.LEFT)
-
-            elif key == Qt.Key_Right:
-                self.logic_model.falling_figure.try_move(Direction.RIGHT)
-
-            elif key == Qt.Key_Down:
-                self.logic_model.falling_figure.try_move(Direction.DOWN)
-
-            elif key == Qt.Key_Up:
-                self.logic_model.falling_figure.try_rotate_left()
-
-            elif key == Qt.Key_Space:
-                self.logic_model.falling_figure.drop_figure()
-                self.logic_model.falling_figure = \
-                    falling_figure.FallingFigure(self.logic_model)
-                self.logic_model.field.remove_completed_rectangle(
-                    self.logic_model.falling_figure)
-                self.logic_model.fell_flag = True
-
-        self._grid_update()
+            elif not self.engine.game_over:
+                self._show_scores()
+                self.loop.reset()
+                self._start_timer()
+
+        elif key == Qt.Key_U and self.timer.isActive():
+            if self.engine.undo():
+                self.recorder.undo(self.engine.ticks)
+
+        elif key == Qt.Key_A and self.timer.isActive():
+            for action in self.assistant.decide(self.logic_model):
+                self.loop.apply(action)
+
+        elif (self.timer.isActive() and key in self.__KEYS_ACTIONS and
+              not event.isAutoRepeat()):
+            self.loop.press(self.__KEYS_ACTIONS[key])
+
+    def keyReleaseEvent(self, event):
+        if event.key() in self.__KEYS_ACTIONS and not event.isAutoRepeat():
+            self.loop.release(self.__KEYS_ACTIONS[event.key()])